@@ -0,0 +1,243 @@
+import cv2
+import numpy as np
+
+DETECT_BUDGET_MS = 60
+MIN_HAND_PX = 96
+SEARCH_HEIGHT = 360
+MIN_DETECT_HEIGHT = 144
+MAX_DETECT_HEIGHT = 1080
+EMA_ALPHA = 0.2
+
+FRAME_BUDGET_MS = 80
+MIN_FRAME_INTERVAL_MS = 66
+MAX_FRAME_INTERVAL_MS = 500
+PACING_HEADROOM = 1.25
+MIN_JPEG_QUALITY = 0.35
+MAX_JPEG_QUALITY = 0.6
+
+THUMB_SIZE = 32
+MOTION_THRESHOLD = 3.0
+HASH_DISTANCE = 4
+MAX_SKIPPED_FRAMES = 10
+
+INFERENCE_BUDGET_MS = 40
+COMPLEXITY_HEADROOM = 0.5
+COMPLEXITY_COOLDOWN = 60
+
+# JPEG scaled decode: libjpeg skips most of the IDCT work at 1/2, 1/4 and 1/8
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def hand_fraction(bbox, frame_width, frame_height):
+    """Size of a normalized (x0, y0, x1, y1) hand box as a fraction of the frame height"""
+    x0, y0, x1, y1 = bbox
+    return max((x1 - x0) * frame_width, (y1 - y0) * frame_height) / frame_height
+
+
+class DetectionResolution:
+    """Picks the frame height to run detection at for one session.
+
+    The target is just large enough for the last seen hand to be MIN_HAND_PX
+    tall (SEARCH_HEIGHT while no hand is tracked), capped by a ceiling that
+    shrinks while detection runs over the latency budget and grows back when
+    there is headroom. Frames are decoded at the largest JPEG reduction that
+    stays at or above the target, and the target is also sent to the client
+    as the upload size it should use.
+    """
+
+    def __init__(self, budget_ms=DETECT_BUDGET_MS, min_hand_px=MIN_HAND_PX):
+        self.budget_ms = budget_ms
+        self.min_hand_px = min_hand_px
+        self.latency_ms = None
+        self.hand_size = None
+        self.ceiling = MAX_DETECT_HEIGHT
+        self.target_height = SEARCH_HEIGHT
+        self.factor = 1
+
+    def decode_flag(self):
+        return REDUCED_DECODE_FLAGS[self.factor]
+
+    def update(self, source_height, latency_ms, hand_size):
+        """Record one processed frame and choose the reduction for the next one.
+
+        source_height is the height of the frame as uploaded, hand_size the
+        hand_fraction of the detected hand or None when no hand was found.
+        """
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += EMA_ALPHA * (latency_ms - self.latency_ms)
+
+        if hand_size is None:
+            self.hand_size = None
+        elif self.hand_size is None:
+            self.hand_size = hand_size
+        else:
+            self.hand_size += EMA_ALPHA * (hand_size - self.hand_size)
+
+        if self.latency_ms > self.budget_ms:
+            self.ceiling = max(MIN_DETECT_HEIGHT, self.ceiling * 0.8)
+        elif self.latency_ms < self.budget_ms * 0.6:
+            self.ceiling = min(MAX_DETECT_HEIGHT, self.ceiling * 1.1)
+
+        if self.hand_size:
+            wanted = self.min_hand_px / self.hand_size
+        else:
+            wanted = SEARCH_HEIGHT
+        target = int(max(MIN_DETECT_HEIGHT, min(wanted, self.ceiling, MAX_DETECT_HEIGHT)))
+
+        # Ignore small wobbles so the client's upload size doesn't thrash
+        if abs(target - self.target_height) > 0.15 * self.target_height:
+            self.target_height = target
+
+        factor = 1
+        while factor < 8 and source_height / (factor * 2) >= self.target_height:
+            factor *= 2
+        self.factor = factor
+
+
+class FramePacing:
+    """Upload pacing hints for one session, derived from its measured processing time.
+
+    The client is asked to send a frame every PACING_HEADROOM x the server's
+    processing time (within MIN/MAX_FRAME_INTERVAL_MS), backs off further when
+    its frames had to be dropped, and lowers its JPEG quality as processing
+    goes over FRAME_BUDGET_MS.
+    """
+
+    def __init__(self, budget_ms=FRAME_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.processing_ms = None
+        self.interval_ms = 200
+        self.quality = 0.5
+        self._dropped = 0
+
+    def update(self, processing_ms, dropped):
+        """Record one processed frame; dropped is the session's running count of dropped frames"""
+        if self.processing_ms is None:
+            self.processing_ms = processing_ms
+        else:
+            self.processing_ms += EMA_ALPHA * (processing_ms - self.processing_ms)
+
+        interval = self.processing_ms * PACING_HEADROOM
+        if dropped > self._dropped:
+            interval = max(interval, self.interval_ms * 1.5)
+        self._dropped = dropped
+        self.interval_ms = int(max(MIN_FRAME_INTERVAL_MS, min(interval, MAX_FRAME_INTERVAL_MS)))
+
+        overload = self.processing_ms / self.budget_ms - 1
+        quality = MAX_JPEG_QUALITY - max(0.0, overload) * (MAX_JPEG_QUALITY - MIN_JPEG_QUALITY)
+        self.quality = round(max(MIN_JPEG_QUALITY, quality), 2)
+
+    def hints(self, detect_height, min_interval=None):
+        interval = self.interval_ms if min_interval is None else max(self.interval_ms, min_interval)
+        return {'interval': interval, 'quality': self.quality, 'height': detect_height}
+
+
+def thumbnail(frame):
+    small = cv2.resize(frame, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def dhash(thumb):
+    """64-bit difference hash of a grayscale thumbnail"""
+    small = cv2.resize(thumb, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class MotionGate:
+    """Reuses the last detection while the scene hasn't changed.
+
+    A frame counts as unchanged when its bytes are identical to the last
+    frame that was run through detection, or when a 32x32 grayscale thumbnail
+    of it has both a low mean difference to that frame's thumbnail and a
+    nearly identical dHash. Comparing against the last inferred frame (rather
+    than the previous one) means slow drift still adds up to a new detection.
+    At most max_skips frames in a row are skipped.
+    """
+
+    def __init__(self, threshold=MOTION_THRESHOLD, hash_distance=HASH_DISTANCE, max_skips=MAX_SKIPPED_FRAMES):
+        self.threshold = threshold
+        self.hash_distance = hash_distance
+        self.max_skips = max_skips
+        self.result = None
+        self.skipped = 0
+        self._digest = None
+        self._thumb = None
+        self._hash = None
+        self._pending = (None, None, None)
+
+    def reuse_for_bytes(self, image):
+        """Cached result if image is byte-identical to the last inferred frame, else None"""
+        digest = hash(bytes(image) if isinstance(image, memoryview) else image)
+        self._pending = (digest, None, None)
+        if self.result is None or digest != self._digest or self.skipped >= self.max_skips:
+            return None
+        self.skipped += 1
+        return self.result
+
+    def reuse_for_frame(self, frame):
+        """Cached result if the decoded frame looks unchanged, else None"""
+        thumb = thumbnail(frame)
+        frame_hash = dhash(thumb)
+        self._pending = (self._pending[0], thumb, frame_hash)
+        if self.result is None or self._thumb is None or self.skipped >= self.max_skips:
+            return None
+
+        energy = float(np.mean(cv2.absdiff(thumb, self._thumb)))
+        distance = bin(frame_hash ^ self._hash).count('1')
+        if energy >= self.threshold or distance > self.hash_distance:
+            return None
+        self.skipped += 1
+        return self.result
+
+    def remember(self, result):
+        """Make the frame just checked the new reference, with its fresh detection result"""
+        self._digest, self._thumb, self._hash = self._pending
+        self.result = result
+        self.skipped = 0
+
+
+class ModelComplexity:
+    """Chooses the MediaPipe Hands model complexity from measured inference time.
+
+    Steps down towards the lite model (0) while the smoothed hands.process time
+    is over budget and back up once it runs under COMPLEXITY_HEADROOM x budget.
+    Each switch rebuilds the graph and loses tracking, so at least
+    COMPLEXITY_COOLDOWN frames are measured on a model before switching again.
+    """
+
+    def __init__(self, budget_ms=INFERENCE_BUDGET_MS, complexity=1, cooldown=COMPLEXITY_COOLDOWN):
+        self.budget_ms = budget_ms
+        self.complexity = complexity
+        self.max_complexity = complexity
+        self.cooldown = cooldown
+        self.latency_ms = None
+        self.frames = 0
+
+    def update(self, latency_ms):
+        """Record one inference time; returns the complexity to use from the next frame on"""
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += EMA_ALPHA * (latency_ms - self.latency_ms)
+        self.frames += 1
+        if self.frames < self.cooldown:
+            return self.complexity
+
+        if self.latency_ms > self.budget_ms and self.complexity > 0:
+            self.complexity -= 1
+        elif self.latency_ms < self.budget_ms * COMPLEXITY_HEADROOM and self.complexity < self.max_complexity:
+            self.complexity += 1
+        else:
+            return self.complexity
+        # New model, new measurements
+        self.latency_ms = None
+        self.frames = 0
+        return self.complexity
@@ -2,18 +2,26 @@ import os
 os.environ['GLOG_minloglevel'] = '3'  
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  
 
-from flask import Flask, render_template, Response, jsonify, send_from_directory, url_for
+from flask import Flask, render_template, Response, jsonify, send_from_directory, url_for, request
 from flask_socketio import SocketIO, emit
-import cv2
 import base64
-import numpy as np
-from gesture_detector import GestureDetector
+import io
+from detector_backends import create_detector, backend_synchronous
+from detector_pool import DetectorPool
+from metrics import (REGISTRY, STAGE_SECONDS, STRIP_RENDER_SECONDS, FRAMES_PROCESSED, FRAMES_DROPPED,
+                     FRAME_RATE, TIMER_LATENESS, Gauge)
+from frame_worker import frame_worker_loop
+from booth_timers import SessionTimers
+from capture_store import Capture, spool_upload, CaptureTooLarge, CAPTURE_TYPES, MAX_CAPTURE_BYTES
+from landmark_log import LandmarkRecorder
+from booth_session import SessionRegistry
+from booth_state import PHOTOS_PER_STRIP, STRIP_GENERATING, COUNTDOWN
+from frame_pipeline import process_frame, get_default_state
 import datetime
 import time
-from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from PIL import Image, ImageDraw, ImageFont
-import io
 
 
 log = logging.getLogger('werkzeug')
@@ -21,47 +29,41 @@ log.setLevel(logging.ERROR)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'photobooth_secret'
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  
+app.config['MAX_CONTENT_LENGTH'] = MAX_CAPTURE_BYTES
 
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
     async_mode='threading',
-    max_http_buffer_size=50 * 1024 * 1024,
+    # Captures normally go to /captures/<token>; this still fits one as a
+    # base64 data URL for pages that send them through save_photo
+    max_http_buffer_size=MAX_CAPTURE_BYTES * 4 // 3 + 64 * 1024,
     ping_timeout=60,
     ping_interval=25
 )
 
 
-gesture_detector = GestureDetector()
-try:
-    gesture_detector.hands.min_detection_confidence = 0.6
-    gesture_detector.hands.min_tracking_confidence = 0.5
-except:
-    pass
+DETECTOR_WORKERS = int(os.environ.get('VISIONBOOTH_DETECTOR_WORKERS', '0'))
+RECORD_LANDMARKS = os.environ.get('VISIONBOOTH_RECORD_LANDMARKS') == '1'
+detector_pool = None
+
 
+sessions = SessionRegistry(create_detector)
+EVICTION_INTERVAL = 30
 
-if not os.path.exists("sessions"):
-    os.mkdir("sessions")
+# Countdown ticks, the shutter and the post-capture pause run off these
+# timers rather than frame arrival, so they stay on time however slowly
+# frames come in.
+booth_timers = SessionTimers()
 
-SESSION_DIR = None
-current_state = {
-    'state': 'PROMPT_TIMER',
-    'timer_value': None,
-    'countdown_end': None,
-    'detected_gesture': None,
-    'last_count': None,
-    'count_streak': 0,
-    'thumb_up_streak': 0,
-    'fist_streak': 0,
-    'capture_count': 0,
-    'captured_images': [],
-    'strip_filename': None
-}
-state_lock = Lock()
+# Strip rendering (capture decodes, LANCZOS resizes, 300-DPI save) runs here
+# so it never holds up a socket handler or the live preview.
+strip_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='strip')
 
-CONSECUTIVE_REQUIRED = 5
-PHOTOS_PER_STRIP = 4
+REGISTRY.register(Gauge('visionbooth_active_sessions', 'Connected booth sessions', lambda: len(sessions)))
+REGISTRY.register(Gauge('visionbooth_detector_queue_depth', 'Detection requests in flight per pool worker',
+                        lambda: dict(enumerate(detector_pool.queue_depths())) if detector_pool else {},
+                        label='worker'))
 
 
 @app.route('/')
@@ -84,264 +86,254 @@ def about():
 def serve_photo(filename):
     return send_from_directory('sessions', filename)
 
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+def open_session(sid):
+    session = sessions.create(sid)
+    if RECORD_LANDMARKS:
+        session.recorder = LandmarkRecorder(os.path.join(session.session_dir, 'landmarks.npz'))
+    session.machine.listener = lambda event: on_booth_transition(session, event)
+    socketio.start_background_task(frame_worker_loop, session.frame_slot,
+                                   lambda data: process_video_frame(session, data))
+    return session
+
+def close_session(sid):
+    booth_timers.cancel(sid)
+    return sessions.remove(sid)
+
+def evict_idle_sessions():
+    while True:
+        socketio.sleep(EVICTION_INTERVAL)
+        for session in sessions.evict_idle():
+            booth_timers.cancel(session.sid)
+            print(f"Evicted idle session: {session.session_dir}")
+
 
 @socketio.on('connect')
 def handle_connect():
-    global SESSION_DIR
-    SESSION_DIR = f"sessions/{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    os.makedirs(SESSION_DIR, exist_ok=True)
-    print(f"Client connected. Session: {SESSION_DIR}")
-    emit('connected', {'session': SESSION_DIR})
+    session = open_session(request.sid)
+    print(f"Client connected. Session: {session.session_dir} ({len(sessions)} active)")
+    emit_connected(session)
+
+def emit_connected(session):
+    emit('connected', {'session': session.session_dir, 'upload_token': session.upload_token})
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    close_session(request.sid)
     print("Client disconnected")
 
 @socketio.on('video_frame')
 def handle_video_frame(data):
-    global current_state
-
+    # Only hand the frame over here; inference runs on the session's frame
+    # worker, which always takes the newest frame and drops stale ones.
+    session = sessions.get(request.sid)
+    if session is None:
+        # Evicted while idle: the new session has a new upload token
+        session = open_session(request.sid)
+        emit_connected(session)
+    session.touch()
+    if session.frame_slot.put(data):
+        FRAMES_DROPPED.inc()
+
+def process_video_frame(session, data):
+    timings = {}
     try:
-
-        img_str = data['image'].split(',')[1]
-        img_data = base64.b64decode(img_str)
-        nparr = np.frombuffer(img_data, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        if frame is None or frame.size == 0:
-            emit('state_update', get_default_state(data['image']))
+        payload = process_frame(session, data['image'], data.get('mode') == 'landmarks', timings)
+        if payload is None:
             return
 
-        try:
-            frame, gesture_name = gesture_detector.detect_gesture(frame)
-        except Exception as gesture_error:
-            print(f"Gesture detection error: {gesture_error}")
-            gesture_name = None
-
-        with state_lock:
-            current_state['detected_gesture'] = gesture_name
-            process_state_machine(gesture_name)
-
-            encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 70]
-            success, buffer = cv2.imencode('.jpg', frame, encode_param)
-            if not success:
-                return
-
-            frame_base64 = base64.b64encode(buffer).decode('utf-8')
-
-            emit('state_update', {
-                'frame': f'data:image/jpeg;base64,{frame_base64}',
-                'state': current_state['state'],
-                'timer_value': current_state['timer_value'],
-                'gesture': gesture_name,
-                'countdown': get_countdown(),
-                'streak_progress': get_streak_progress(),
-                'trigger_capture': (current_state['state'] == 'CAPTURE_DONE'),
-                'capture_count': current_state['capture_count'],
-                'total_captures': PHOTOS_PER_STRIP,
-                'strip_ready': current_state['capture_count'] >= PHOTOS_PER_STRIP,
-                'strip_filename': current_state['strip_filename']
-            })
+        with STAGE_SECONDS.time('emit'):
+            socketio.emit('state_update', payload, to=session.sid)
+        FRAMES_PROCESSED.inc()
+        FRAME_RATE.mark()
 
     except Exception as e:
         print(f"Error processing frame: {e}")
-        emit('state_update', get_default_state(data.get('image', '')))
-
-def get_default_state(image):
-    return {
-        'frame': image,
-        'state': current_state['state'],
-        'timer_value': current_state['timer_value'],
-        'gesture': None,
-        'countdown': get_countdown(),
-        'streak_progress': get_streak_progress(),
-        'trigger_capture': False,
-        'capture_count': current_state['capture_count'],
-        'total_captures': PHOTOS_PER_STRIP
-    }
-
-
-def process_state_machine(gesture_name):
-    global current_state
-
-    state = current_state['state']
-    current_time = time.time()
-
-    finger_count_map = {
-        "One Finger": 1,
-        "Peace Sign": 2,
-        "Three Fingers": 3,
-        "Four Fingers": 4,
-        "Open Palm": 5
-    }
-
-    detected_count = finger_count_map.get(gesture_name)
-    thumb_up = (gesture_name == "Thumbs Up")
-    fist_detected = (gesture_name == "Fist")
-
-    if state == 'PROMPT_TIMER':
-        if detected_count and 1 <= detected_count <= 5:
-            current_state.update({'state': 'DETECTING_FINGERS', 'last_count': detected_count, 'count_streak': 1})
-
-    elif state == 'DETECTING_FINGERS':
-        if detected_count:
-            if detected_count == current_state['last_count']:
-                current_state['count_streak'] += 1
-                if current_state['count_streak'] >= CONSECUTIVE_REQUIRED:
-                    current_state.update({'timer_value': detected_count, 'state': 'TIMER_SET', 'count_streak': 0})
-                    print(f"Timer set to: {detected_count}s")
-            else:
-                current_state.update({'count_streak': 1, 'last_count': detected_count})
-        else:
-            reset_to_prompt()
-
-    elif state == 'TIMER_SET':
-        current_state.update({'state': 'AWAIT_THUMBS_UP', 'thumb_up_streak': 0, 'fist_streak': 0})
-
-    elif state == 'AWAIT_THUMBS_UP':
-        if thumb_up:
-            current_state['thumb_up_streak'] += 1
-            if current_state['thumb_up_streak'] >= CONSECUTIVE_REQUIRED:
-                current_state.update({'countdown_end': current_time + current_state['timer_value'], 'state': 'COUNTDOWN'})
-                print(f"▶ Starting countdown: {current_state['timer_value']}s")
-        elif fist_detected:
-            current_state['fist_streak'] += 1
-            if current_state['fist_streak'] >= CONSECUTIVE_REQUIRED:
-                print("Resetting timer")
-                reset_to_prompt()
-        else:
-            current_state['thumb_up_streak'] = current_state['fist_streak'] = 0
-
-    elif state == 'COUNTDOWN':
-        if get_countdown() is not None and get_countdown() <= 0:
-            current_state.update({'state': 'CAPTURE_DONE', 'countdown_end': None})
-            print(f"Capture {current_state['capture_count'] + 1}/{PHOTOS_PER_STRIP}")
-
-def reset_to_prompt():
-    global current_state
-    current_state.update({
-        'state': 'PROMPT_TIMER',
-        'timer_value': None,
-        'countdown_end': None,
-        'detected_gesture': None,
-        'last_count': None,
-        'count_streak': 0,
-        'thumb_up_streak': 0,
-        'fist_streak': 0,
-        'capture_count': 0,
-        'captured_images': [],
-        'strip_filename': None
-    })
-
-def get_countdown():
-    if current_state['state'] == 'COUNTDOWN' and current_state['countdown_end']:
-        remaining = current_state['countdown_end'] - time.time()
-        return max(0, int(round(remaining)))
-    return None
-
-def get_streak_progress():
-    if current_state['state'] == 'DETECTING_FINGERS':
-        return {'current': current_state['count_streak'], 'required': CONSECUTIVE_REQUIRED}
-    elif current_state['state'] == 'AWAIT_THUMBS_UP':
-        if current_state['thumb_up_streak'] > 0:
-            return {'current': current_state['thumb_up_streak'], 'required': CONSECUTIVE_REQUIRED}
-        elif current_state['fist_streak'] > 0:
-            return {'current': current_state['fist_streak'], 'required': CONSECUTIVE_REQUIRED}
-    return None
+        socketio.emit('state_update', get_default_state(session, data.get('image', '')), to=session.sid)
+
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage)
+
 
+@app.route('/captures/<token>', methods=['POST'])
+def upload_capture(token):
+    """Binary capture upload (JPEG/WebP/PNG body), streamed to disk and acked over Socket.IO"""
+    session = sessions.by_upload_token(token)
+    if session is None:
+        return jsonify({'error': 'No active session'}), 404
+    extension = CAPTURE_TYPES.get(request.mimetype)
+    if extension is None:
+        return reject_capture(session, f'Unsupported capture type {request.mimetype!r}', 415)
+    body, status = store_capture(session, request.stream, extension)
+    return jsonify(body), status
 
 @socketio.on('save_photo')
 def handle_save_photo(data):
-    global SESSION_DIR
-
+    """Data-URL captures from pages loaded before /captures existed; same path as an upload"""
+    session = sessions.get(request.sid)
+    if session is None:
+        emit('photo_error', {'error': 'No active session'})
+        return
+    img_data = data.get('image') or ''
+    header, _, encoded = img_data.partition(',')
+    extension = CAPTURE_TYPES.get(header[len('data:'):].split(';')[0])
+    if extension is None or not encoded:
+        reject_capture(session, 'No image data', 400)
+        return
     try:
-        if current_state['capture_count'] >= PHOTOS_PER_STRIP:
-            return
+        stream = io.BytesIO(base64.b64decode(encoded))
+    except ValueError:
+        reject_capture(session, 'Invalid image data', 400)
+        return
+    store_capture(session, stream, extension)
+
+def reject_capture(session, error, status):
+    """A capture upload failed. If the booth was waiting on it, start over instead of waiting forever."""
+    with session.state_lock:
+        pending = session.machine.capture_pending()
+        if pending:
+            session.machine.reset()
+    if pending:
+        socketio.emit('photo_error', {'error': error}, to=session.sid)
+    return {'error': error}, status
+
+def store_capture(session, stream, extension):
+    """Spool, decode and hand a capture to the state machine; returns (response body, HTTP status)"""
+    machine = session.machine
+    session.touch()
 
-        if SESSION_DIR is None or not os.path.exists(SESSION_DIR):
-            SESSION_DIR = f"sessions/{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            os.makedirs(SESSION_DIR, exist_ok=True)
+    try:
+        upload = spool_upload(stream, session.session_dir)
+    except CaptureTooLarge as e:
+        return reject_capture(session, str(e), 413)
+    except ValueError as e:
+        return reject_capture(session, str(e), 400)
 
-        img_data = data.get('image')
-        if not img_data:
-            emit('photo_error', {'error': 'No image data'})
-            return
+    # Decode once, outside the state lock; only the slot-sized copy stays in memory
+    try:
+        with STAGE_SECONDS.time('capture_decode'):
+            capture = Capture.load(upload, PHOTO_SLOT)
+    except Exception as e:
+        os.remove(upload)
+        return reject_capture(session, f'Unreadable capture: {e}', 400)
 
-        current_state['captured_images'].append(img_data)
-        current_state['capture_count'] += 1
-
-        emit('photo_received', {'count': current_state['capture_count'], 'total': PHOTOS_PER_STRIP})
-
-        if current_state['capture_count'] >= PHOTOS_PER_STRIP:
-            current_state['state'] = 'STRIP_GENERATING'
-            strip_filename = create_photo_strip(current_state['captured_images'], SESSION_DIR)
-            if strip_filename:
-                current_state['strip_filename'] = strip_filename
-                emit('strip_ready', {'filename': strip_filename, 'message': 'Photo strip ready!'})
-            reset_to_prompt()
-        else:
-            time.sleep(1)
-            current_state.update({
-                'countdown_end': time.time() + current_state['timer_value'],
-                'state': 'COUNTDOWN'
-            })
+    try:
+        with session.state_lock:
+            if not machine.capture_pending():
+                # Duplicate or late upload: only the spooled file is ours to drop
+                os.remove(upload)
+                return {'error': 'No capture pending'}, 409
+            if machine.capture_count == 0:
+                session.capture_round += 1
+            capture_count = machine.capture_count + 1
+            capture.path = os.path.join(session.session_dir,
+                                        f"capture_{session.capture_round}_{capture_count}{extension}")
+            os.replace(upload, capture.path)
+            machine.photo_saved(capture)
+            strip_started = machine.state == STRIP_GENERATING
+            captures = list(machine.photos)
+
+        socketio.emit('photo_received', {'count': capture_count, 'total': PHOTOS_PER_STRIP}, to=session.sid)
+
+        # Otherwise the booth timer resumes the countdown after the pause
+        if strip_started:
+            future = strip_executor.submit(render_photo_strip, captures, session.session_dir)
+            future.add_done_callback(lambda f: finish_photo_strip(session, f))
+        return {'count': capture_count, 'total': PHOTOS_PER_STRIP}, 200
 
     except Exception as e:
         print(f"Error saving photo: {e}")
-        reset_to_prompt()
-        emit('photo_error', {'error': str(e)})
+        if os.path.exists(upload):
+            os.remove(upload)
+        with session.state_lock:
+            machine.reset()
+        socketio.emit('photo_error', {'error': str(e)}, to=session.sid)
+        return {'error': str(e)}, 500
+
+def arm_booth_timer(session):
+    """Point the session's timer at the machine's next countdown second, shutter or resume; needs state_lock"""
+    due = session.machine.next_timer()
+    if due is None:
+        booth_timers.cancel(session.sid)
+    else:
+        booth_timers.schedule(session.sid, due, run_booth_timer, session, due)
+
+def on_booth_transition(session, event):
+    """Machine listener, called with state_lock held by whoever drove the transition"""
+    arm_booth_timer(session)
+    _, trigger, _, _ = event
+    if trigger == 'capture_timeout':
+        socketio.emit('photo_error', {'error': 'The photo never arrived'}, to=session.sid)
+    elif trigger == 'countdown_elapsed':
+        # Push the shutter straight away instead of waiting for the next frame's state_update
+        socketio.emit('trigger_capture', {'capture': session.machine.capture_count + 1,
+                                          'total': PHOTOS_PER_STRIP}, to=session.sid)
+
+def run_booth_timer(session, due):
+    TIMER_LATENESS.observe(max(0.0, time.time() - due))
+    with session.state_lock:
+        machine = session.machine
+        machine.tick()
+        countdown = machine.countdown() if machine.state == COUNTDOWN else None
+        arm_booth_timer(session)
+    if countdown is not None:
+        socketio.emit('countdown', {'countdown': countdown}, to=session.sid)
+
+def render_photo_strip(captures, session_dir):
+    with STRIP_RENDER_SECONDS.time():
+        return create_photo_strip(captures, session_dir)
+
+def finish_photo_strip(session, future):
+    try:
+        strip_filename = future.result()
+    except Exception as e:
+        print(f"Error creating strip: {e}")
+        strip_filename = None
+
+    with session.state_lock:
+        session.machine.strip_done()
+
+    if strip_filename:
+        socketio.emit('strip_ready', {'filename': strip_filename, 'message': 'Photo strip ready!'}, to=session.sid)
+    else:
+        socketio.emit('photo_error', {'error': 'Could not create photo strip'}, to=session.sid)
+
+
+
+# Strip layout. Captures are cut down to PHOTO_SLOT as they arrive, so
+# rendering a strip only pastes the small copies.
+DPI = 300
+STRIP_WIDTH_MM = 51
+STRIP_HEIGHT_MM = 152
 
+MM_TO_INCH = 0.0393701
+STRIP_WIDTH_PX = int(STRIP_WIDTH_MM * MM_TO_INCH * DPI)  # ~602px
+STRIP_HEIGHT_PX = int(STRIP_HEIGHT_MM * MM_TO_INCH * DPI)  # ~1795px
 
+TOP_BORDER = 60
+SIDE_BORDER = 60
+PHOTO_SPACING = 40
+BOTTOM_AREA = 100
 
-def create_photo_strip(images, session_dir):
+PHOTO_HEIGHT = (STRIP_HEIGHT_PX - TOP_BORDER - BOTTOM_AREA - (PHOTO_SPACING * (PHOTOS_PER_STRIP - 1))) // PHOTOS_PER_STRIP
+PHOTO_WIDTH = STRIP_WIDTH_PX - (SIDE_BORDER * 2)
+PHOTO_SLOT = (PHOTO_WIDTH, PHOTO_HEIGHT)
+
+
+def create_photo_strip(captures, session_dir):
     try:
-       
-        DPI = 300
-        STRIP_WIDTH_MM = 51
-        STRIP_HEIGHT_MM = 152
-        
-    
-        MM_TO_INCH = 0.0393701
-        STRIP_WIDTH_PX = int(STRIP_WIDTH_MM * MM_TO_INCH * DPI)  # ~602px
-        STRIP_HEIGHT_PX = int(STRIP_HEIGHT_MM * MM_TO_INCH * DPI)  # ~1795px
-        
- 
-        TOP_BORDER = 60
-        SIDE_BORDER = 60
-        PHOTO_SPACING = 40
-        BOTTOM_AREA = 100  
-        
-        available_height = STRIP_HEIGHT_PX - TOP_BORDER - BOTTOM_AREA - (PHOTO_SPACING * (PHOTOS_PER_STRIP - 1))
-        PHOTO_HEIGHT = available_height // PHOTOS_PER_STRIP
-        PHOTO_WIDTH = STRIP_WIDTH_PX - (SIDE_BORDER * 2)
-        
         print(f"Strip size: {STRIP_WIDTH_PX}x{STRIP_HEIGHT_PX}px ({STRIP_WIDTH_MM}x{STRIP_HEIGHT_MM}mm)")
         print(f"Photo slots: {PHOTO_WIDTH}x{PHOTO_HEIGHT}px")
         
         FRAME_COLOR = (255, 255, 255)
         strip = Image.new('RGB', (STRIP_WIDTH_PX, STRIP_HEIGHT_PX), FRAME_COLOR)
 
-        for i, img_data in enumerate(images):
-            img_bytes = base64.b64decode(img_data.split(',')[1])
-            photo = Image.open(io.BytesIO(img_bytes))
-            
-    
-            target_aspect = PHOTO_WIDTH / PHOTO_HEIGHT
-            photo_aspect = photo.width / photo.height
-
-            if photo_aspect > target_aspect:
-            
-                new_width = int(photo.height * target_aspect)
-                left = (photo.width - new_width) // 2
-                photo = photo.crop((left, 0, left + new_width, photo.height))
-            else:
-          
-                new_height = int(photo.width / target_aspect)
-                top = (photo.height - new_height) // 2
-                photo = photo.crop((0, top, photo.width, top + new_height))
-            
-            photo = photo.resize((PHOTO_WIDTH, PHOTO_HEIGHT), Image.Resampling.LANCZOS)
-
+        for i, capture in enumerate(captures):
+            photo = capture.slot_image(PHOTO_SLOT)
             y_pos = TOP_BORDER + i * (PHOTO_HEIGHT + PHOTO_SPACING)
             strip.paste(photo, (SIDE_BORDER, y_pos))
         
@@ -390,4 +382,14 @@ if __name__ == '__main__':
     print("VisionBooth Starting...")
     print("Open browser at: http://localhost:5000")
     print("=" * 50)
+
+    # The pool is started here and not at import time: spawned workers
+    # re-import this module and must not start pools of their own.
+    if DETECTOR_WORKERS > 0:
+        detector_pool = DetectorPool(DETECTOR_WORKERS, create_detector, synchronous=backend_synchronous())
+        sessions.detector_factory = detector_pool.handle
+        print(f"Detector pool: {DETECTOR_WORKERS} worker processes")
+
+    socketio.start_background_task(evict_idle_sessions)
+    socketio.start_background_task(booth_timers.run)
     socketio.run(app, debug=False, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
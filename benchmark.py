@@ -0,0 +1,205 @@
+"""Replay recorded frames through the booth's frame pipeline and report timings as JSON.
+
+    python benchmark.py recordings/event_01/            # directory of JPEG/PNG/WebP frames
+    python benchmark.py recordings/event_01.mp4 --mode landmarks --height 378
+
+Frames go through the same decode -> detector -> state machine -> encode
+path as a live video_frame, without a browser or camera. The state machine
+runs on a manual clock advanced by --frame-interval-ms per frame, so runs are
+repeatable. Unless --follow-states is given it is put back into a detection
+state whenever it leaves one, so every timed frame is decoded and inferred.
+"""
+import os
+os.environ['GLOG_minloglevel'] = '3'
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+import sys
+import json
+import time
+import base64
+import argparse
+import contextlib
+import tempfile
+import platform
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from detector_backends import create_detector, selected_backend, BACKENDS
+from booth_session import BoothSession
+from booth_state import BoothStateMachine, ManualClock, INFERENCE_NONE, STRIP_GENERATING
+from frame_pipeline import process_frame
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+FRAME_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+UPLOAD_QUALITY = 50
+FRAME_INTERVAL_MS = 33
+
+
+def load_frames(path, height=None, limit=None):
+    """Load frames as encoded bytes, the way a client would upload them"""
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(FRAME_EXTENSIONS))
+        frames = []
+        for name in names[:limit]:
+            with open(os.path.join(path, name), 'rb') as f:
+                data = f.read()
+            if height:
+                data = upload_bytes(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), height)
+            frames.append(data)
+        return frames
+
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while limit is None or len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(upload_bytes(frame, height))
+    cap.release()
+    return frames
+
+
+def upload_bytes(frame, height=None):
+    if height and frame.shape[0] != height:
+        width = int(round(frame.shape[1] * height / frame.shape[0]))
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    success, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), UPLOAD_QUALITY])
+    return buffer.tobytes()
+
+
+def percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        'count': int(ms.size),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p90_ms': round(float(np.percentile(ms, 90)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run(frames, landmarks_only=False, data_url=False, warmup=5, backend=None,
+        frame_interval_ms=FRAME_INTERVAL_MS, follow_states=False):
+    backend = backend or selected_backend()
+    session = BoothSession('benchmark', tempfile.gettempdir(), create_detector(backend))
+    clock = ManualClock()
+    session.machine = machine = BoothStateMachine(clock=clock)
+    if data_url:
+        frames = [f"data:image/jpeg;base64,{base64.b64encode(f).decode('utf-8')}" for f in frames]
+
+    def next_frame():
+        """Advance the clock one frame; True when the current state skips inference"""
+        clock.advance(frame_interval_ms / 1000)
+        machine.tick()
+        if not follow_states and machine.inference_need() == INFERENCE_NONE:
+            machine.reset()
+        if machine.capture_pending():
+            # Stands in for the client's capture upload
+            machine.photo_saved(None)
+        if machine.state == STRIP_GENERATING:
+            machine.strip_done()
+        return machine.inference_need() == INFERENCE_NONE
+
+    for image in frames[:warmup]:
+        next_frame()
+        process_frame(session, image, landmarks_only)
+
+    stages = {}
+    totals = []
+    skipped = 0
+    gestures = Counter()
+
+    started = time.perf_counter()
+    for image in frames:
+        if next_frame():
+            # Countdown and capture states: no decode or inference to time
+            process_frame(session, image, landmarks_only)
+            skipped += 1
+            continue
+        timings = {}
+        frame_started = time.perf_counter()
+        payload = process_frame(session, image, landmarks_only, timings)
+        totals.append(time.perf_counter() - frame_started)
+        for stage, seconds in timings.items():
+            stages.setdefault(stage, []).append(seconds)
+        gestures[(payload or {}).get('gesture')] += 1
+    elapsed = time.perf_counter() - started
+    session.close()
+
+    inferred = sum(totals)
+    return {
+        'frames': len(frames),
+        'inferred_frames': len(totals),
+        'state_skipped_frames': skipped,
+        'backend': backend,
+        'mode': 'landmarks' if landmarks_only else 'image',
+        'transport': 'data_url' if data_url else 'binary',
+        'frame_interval_ms': frame_interval_ms,
+        'follow_states': follow_states,
+        'seconds': round(elapsed, 3),
+        # Throughput of frames that went through detection only
+        'fps': round(len(totals) / inferred, 2) if inferred else None,
+        'total': percentiles(totals) if totals else None,
+        'stages': {stage: percentiles(values) for stage, values in sorted(stages.items())},
+        'gestures': {str(name): count for name, count in gestures.most_common()},
+        'peak_rss_mb': peak_rss_mb(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the VisionBooth frame pipeline on recorded frames")
+    parser.add_argument('source', help="directory of frames or a video file")
+    parser.add_argument('--mode', choices=['image', 'landmarks'], default='image',
+                        help="response mode to simulate (default: image)")
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        help="detector backend (default: VISIONBOOTH_DETECTOR_BACKEND or mediapipe)")
+    parser.add_argument('--data-url', action='store_true', help="send frames as base64 data URLs instead of bytes")
+    parser.add_argument('--height', type=int, help="resize frames to this upload height first")
+    parser.add_argument('--limit', type=int, help="use at most this many frames")
+    parser.add_argument('--warmup', type=int, default=5, help="frames to run before timing (default: 5)")
+    parser.add_argument('--frame-interval-ms', type=float, default=FRAME_INTERVAL_MS,
+                        help=f"state machine time between frames (default: {FRAME_INTERVAL_MS})")
+    parser.add_argument('--follow-states', action='store_true',
+                        help="let the booth flow reach countdown states, which skip inference; "
+                             "those frames are counted separately and not timed")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    frames = load_frames(args.source, args.height, args.limit)
+    if not frames:
+        parser.error(f"no frames found in {args.source}")
+
+    # Keep the pipeline's progress prints out of the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(frames, args.mode == 'landmarks', args.data_url, args.warmup, args.backend,
+                     args.frame_interval_ms, args.follow_states)
+    report['source'] = args.source
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import os
+import datetime
+import time
+import secrets
+from threading import Lock
+
+from frame_worker import LatestFrameSlot
+from adaptive import DetectionResolution, FramePacing, MotionGate
+from booth_state import BoothStateMachine
+
+SESSION_IDLE_TIMEOUT = 300
+
+
+class BoothSession:
+    """Everything one connected booth screen owns: state machine, captures, directory and detector"""
+
+    def __init__(self, sid, session_dir, detector):
+        self.sid = sid
+        self.session_dir = session_dir
+        # Names the session in capture upload URLs without exposing the sid
+        self.upload_token = secrets.token_urlsafe(16)
+        # Numbers each strip's captures so later rounds never overwrite them
+        self.capture_round = 0
+        self.detector = detector
+        self.machine = BoothStateMachine(verbose=True)
+        self.state_lock = Lock()
+        self.detector_lock = Lock()
+        self.frame_slot = LatestFrameSlot()
+        self.resolution = DetectionResolution()
+        self.pacing = FramePacing()
+        self.motion_gate = MotionGate()
+        self.last_active = time.time()
+        self.recorder = None
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def close(self):
+        self.frame_slot.close()
+        if self.recorder is not None:
+            self.recorder.save()
+        with self.detector_lock:
+            if hasattr(self.detector, 'close'):
+                self.detector.close()
+
+
+class SessionRegistry:
+    """Booth sessions keyed by Socket.IO sid, with idle eviction"""
+
+    def __init__(self, detector_factory, root="sessions", idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.detector_factory = detector_factory
+        self.root = root
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._lock = Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, sid):
+        session_dir = f"{self.root}/{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{sid[:8]}"
+        os.makedirs(session_dir, exist_ok=True)
+        session = BoothSession(sid, session_dir, self.detector_factory())
+
+        with self._lock:
+            previous = self._sessions.pop(sid, None)
+            self._sessions[sid] = session
+        if previous is not None:
+            previous.close()
+        return session
+
+    def get(self, sid):
+        return self._sessions.get(sid)
+
+    def by_upload_token(self, token):
+        with self._lock:
+            for session in self._sessions.values():
+                if secrets.compare_digest(session.upload_token, token):
+                    return session
+        return None
+
+    def remove(self, sid):
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+        if session is not None:
+            session.close()
+        return session
+
+    def evict_idle(self, now=None):
+        """Close and drop sessions that have not sent anything for idle_timeout seconds"""
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if now - s.last_active > self.idle_timeout]
+            evicted = [self._sessions.pop(sid) for sid in idle]
+        for session in evicted:
+            session.close()
+        return evicted
@@ -0,0 +1,368 @@
+"""The photo booth flow as a standalone, table-driven state machine.
+
+BoothStateMachine has no Flask, OpenCV or MediaPipe dependencies and reads
+time only through an injected clock, so the web app, the desktop app,
+landmark replays and simulations all drive the same flow:
+
+    machine = BoothStateMachine()
+    machine.step("Peace Sign", score=0.9)   # once per processed frame
+    machine.tick()                          # time-driven transitions, at machine.next_timer()
+    machine.photo_saved(image)              # capture stored by the caller
+    machine.strip_done()                    # strip rendered (or given up on)
+
+Frames are turned into triggers by the current state's sensor in
+FRAME_SENSORS, and every trigger is resolved through TRANSITIONS.
+"""
+import time
+import math
+from collections import deque
+
+PROMPT_TIMER = 'PROMPT_TIMER'
+DETECTING_FINGERS = 'DETECTING_FINGERS'
+TIMER_SET = 'TIMER_SET'
+AWAIT_THUMBS_UP = 'AWAIT_THUMBS_UP'
+COUNTDOWN = 'COUNTDOWN'
+CAPTURE_DONE = 'CAPTURE_DONE'
+STRIP_GENERATING = 'STRIP_GENERATING'
+STATES = (PROMPT_TIMER, DETECTING_FINGERS, TIMER_SET, AWAIT_THUMBS_UP, COUNTDOWN, CAPTURE_DONE, STRIP_GENERATING)
+
+PHOTOS_PER_STRIP = 4
+POST_CAPTURE_PAUSE = 1.0
+# Give up on a capture whose photo hasn't arrived this long after the shutter
+CAPTURE_TIMEOUT = 10.0
+EVENT_LOG_SIZE = 256
+
+# A gesture is confirmed once it has led the confidence-weighted vote for a
+# full CONFIRM_WINDOW_MS; it only loses the lead below RELEASE_SHARE.
+CONFIRM_WINDOW_MS = 1000
+CONFIRM_SHARE = 0.6
+RELEASE_SHARE = 0.35
+MISS_WEIGHT = 1.0
+
+FINGER_COUNTS = {
+    "One Finger": 1,
+    "Peace Sign": 2,
+    "Three Fingers": 3,
+    "Four Fingers": 4,
+    "Open Palm": 5
+}
+THUMBS_GESTURES = ("Thumbs Up", "Fist")
+
+# What each state needs from detection: nothing, just thumbs up vs fist, or
+# the full finger count. States that need nothing skip decode and inference.
+INFERENCE_NONE = 'none'
+INFERENCE_THUMBS = 'thumbs'
+INFERENCE_FINGERS = 'fingers'
+
+STATE_INFERENCE = {
+    PROMPT_TIMER: INFERENCE_FINGERS,
+    DETECTING_FINGERS: INFERENCE_FINGERS,
+    TIMER_SET: INFERENCE_NONE,
+    AWAIT_THUMBS_UP: INFERENCE_THUMBS,
+    COUNTDOWN: INFERENCE_NONE,
+    CAPTURE_DONE: INFERENCE_NONE,
+    STRIP_GENERATING: INFERENCE_NONE,
+}
+
+# (state, trigger) -> (next state, action); '*' matches any state
+TRANSITIONS = {
+    (PROMPT_TIMER, 'fingers_seen'): (DETECTING_FINGERS, '_start_vote'),
+    (DETECTING_FINGERS, 'fingers_lost'): (PROMPT_TIMER, '_reset'),
+    (DETECTING_FINGERS, 'fingers_confirmed'): (TIMER_SET, '_set_timer'),
+    (TIMER_SET, 'frame'): (AWAIT_THUMBS_UP, '_clear_vote'),
+    (AWAIT_THUMBS_UP, 'thumbs_up_confirmed'): (COUNTDOWN, '_start_countdown'),
+    (AWAIT_THUMBS_UP, 'fist_confirmed'): (PROMPT_TIMER, '_reset'),
+    (COUNTDOWN, 'countdown_elapsed'): (CAPTURE_DONE, '_trigger_capture'),
+    (CAPTURE_DONE, 'photo_saved'): (CAPTURE_DONE, '_store_photo'),
+    (CAPTURE_DONE, 'last_photo_saved'): (STRIP_GENERATING, '_store_photo'),
+    (CAPTURE_DONE, 'pause_elapsed'): (COUNTDOWN, '_start_countdown'),
+    (CAPTURE_DONE, 'capture_timeout'): (PROMPT_TIMER, '_reset'),
+    (STRIP_GENERATING, 'strip_done'): (PROMPT_TIMER, '_reset'),
+    ('*', 'reset'): (PROMPT_TIMER, '_reset'),
+}
+
+# Which sensor turns a frame's gesture into a trigger in each state
+FRAME_SENSORS = {
+    PROMPT_TIMER: '_sense_fingers_seen',
+    DETECTING_FINGERS: '_sense_finger_vote',
+    TIMER_SET: '_sense_frame',
+    AWAIT_THUMBS_UP: '_sense_thumbs_vote',
+}
+
+
+def inference_need(state):
+    return STATE_INFERENCE.get(state, INFERENCE_FINGERS)
+
+
+def gesture_for_need(need, gesture_name):
+    """The part of a classified gesture the state machine should see for an inference need"""
+    if need == INFERENCE_NONE or (need == INFERENCE_THUMBS and gesture_name not in THUMBS_GESTURES):
+        return None
+    return gesture_name
+
+
+class ManualClock:
+    """Clock for replays and simulations: returns whatever time it was last set to"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def set(self, now):
+        self.now = now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class GestureVote:
+    """Confidence-weighted vote over the gestures seen in the last window_ms.
+
+    Each frame votes for its gesture with the detection score (frames without
+    one vote for None with MISS_WEIGHT). A gesture seen while there is no
+    candidate becomes it straight away, and stays it until its share of the
+    votes since it took the lead falls under RELEASE_SHARE (the lead then
+    passes to the leading vote), so one misread frame doesn't reset progress.
+    The candidate is confirmed after leading for a whole window with at least
+    CONFIRM_SHARE of the votes, however many frames arrived in that time.
+    """
+
+    def __init__(self, window_ms=None):
+        self.window = (CONFIRM_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.votes = deque()
+        self.candidate = None
+        self.since = None
+        self.share = 0.0
+
+    def clear(self):
+        self.votes.clear()
+        self.candidate = None
+        self.since = None
+        self.share = 0.0
+
+    def update(self, gesture, score, now):
+        """Add one frame's vote; returns True once the candidate is confirmed"""
+        self.votes.append((now, gesture, score if gesture else MISS_WEIGHT))
+        while now - self.votes[0][0] > self.window:
+            self.votes.popleft()
+
+        # Only votes cast since the candidate took the lead count for or against it
+        since = self.since if self.candidate is not None else None
+        weights = {}
+        for t, name, weight in self.votes:
+            if since is None or t >= since:
+                weights[name] = weights.get(name, 0) + weight
+        total = sum(weights.values()) or 1.0
+        if self.candidate is None or weights.get(self.candidate, 0) / total < RELEASE_SHARE:
+            leader = gesture if self.candidate is None else max(weights, key=weights.get)
+            if leader != self.candidate:
+                self.candidate = leader
+                self.since = now
+        self.share = weights.get(self.candidate, 0) / total
+        return self.confirmed(now)
+
+    def progress(self, now):
+        """Fraction of the window the current candidate has led for"""
+        if self.candidate is None:
+            return 0.0
+        return min(1.0, (now - self.since) / self.window)
+
+    def confirmed(self, now):
+        return self.candidate is not None and self.progress(now) >= 1 and self.share >= CONFIRM_SHARE
+
+
+class BoothStateMachine:
+    """One booth's flow from timer selection through countdowns to a finished strip.
+
+    All times come from clock (time.time by default). Every transition is
+    appended to events as (time, trigger, from_state, to_state) and passed to
+    listener when one is set. Captured photos are kept as the opaque objects
+    handed to photo_saved().
+    """
+
+    __slots__ = ('clock', 'listener', 'verbose', 'photos_per_strip', 'post_capture_pause', 'capture_timeout',
+                 'events', 'state', 'timer_value', 'countdown_end', 'resume_at', 'capture_deadline',
+                 'detected_gesture', 'vote', 'capture_count', 'photos', 'strip_filename')
+
+    def __init__(self, clock=time.time, photos_per_strip=PHOTOS_PER_STRIP, post_capture_pause=POST_CAPTURE_PAUSE,
+                 listener=None, verbose=False, capture_timeout=CAPTURE_TIMEOUT):
+        self.clock = clock
+        self.listener = listener
+        self.verbose = verbose
+        self.photos_per_strip = photos_per_strip
+        self.post_capture_pause = post_capture_pause
+        self.capture_timeout = capture_timeout
+        self.events = deque(maxlen=EVENT_LOG_SIZE)
+        self.state = PROMPT_TIMER
+        self.detected_gesture = None
+        self.vote = GestureVote()
+        self._reset(None, self.clock())
+
+    def step(self, gesture, score=1.0, now=None):
+        """Feed one processed frame's gesture; returns the state afterwards"""
+        now = self.clock() if now is None else now
+        self.tick(now)
+        self.detected_gesture = gesture
+        sensor = FRAME_SENSORS.get(self.state)
+        if sensor is not None:
+            trigger = getattr(self, sensor)(gesture, score, now)
+            if trigger is not None:
+                self.fire(trigger, (gesture, score), now)
+        return self.state
+
+    def tick(self, now=None):
+        """Apply the transitions that are due purely by time"""
+        now = self.clock() if now is None else now
+        if self.state == COUNTDOWN and self.countdown_end is not None and now >= self.countdown_end:
+            self.fire('countdown_elapsed', None, now)
+        elif self.state == CAPTURE_DONE and self.resume_at is not None and now >= self.resume_at:
+            self.fire('pause_elapsed', None, now)
+        elif self.capture_pending() and self.capture_deadline is not None and now >= self.capture_deadline:
+            self.fire('capture_timeout', None, now)
+        return self.state
+
+    def fire(self, trigger, data=None, now=None):
+        """Resolve a trigger through TRANSITIONS; returns False if the current state ignores it"""
+        now = self.clock() if now is None else now
+        transition = TRANSITIONS.get((self.state, trigger)) or TRANSITIONS.get(('*', trigger))
+        if transition is None:
+            return False
+
+        source, (target, action) = self.state, transition
+        self.state = target
+        getattr(self, action)(data, now)
+        event = (now, trigger, source, target)
+        self.events.append(event)
+        if self.verbose and source != target:
+            print(f"{source} -> {target} ({trigger})")
+        if self.listener is not None:
+            self.listener(event)
+        return True
+
+    def capture_pending(self):
+        """True between the shutter and the photo for it arriving"""
+        return self.state == CAPTURE_DONE and self.resume_at is None
+
+    def photo_saved(self, photo, now=None):
+        """Store the photo for the capture that was just triggered; False if none is pending"""
+        if not self.capture_pending():
+            return False
+        last = self.capture_count + 1 >= self.photos_per_strip
+        return self.fire('last_photo_saved' if last else 'photo_saved', photo, now)
+
+    def strip_done(self, now=None):
+        return self.fire('strip_done', None, now)
+
+    def reset(self, now=None):
+        return self.fire('reset', None, now)
+
+    def inference_need(self):
+        return inference_need(self.state)
+
+    def countdown(self, now=None):
+        """Whole seconds left on the countdown as shown to the user, or None"""
+        if self.state == COUNTDOWN and self.countdown_end:
+            remaining = self.countdown_end - (self.clock() if now is None else now)
+            return max(0, int(round(remaining)))
+        return None
+
+    def next_timer(self, now=None):
+        """When the machine next needs a tick(): each whole second of a countdown, the end of the pause,
+        or the deadline for a pending capture's photo"""
+        now = self.clock() if now is None else now
+        if self.state == COUNTDOWN and self.countdown_end is not None:
+            # Land exactly on the moments the displayed countdown reads 2, 1, 0
+            seconds = max(0, math.ceil(self.countdown_end - now - 1e-3) - 1)
+            return self.countdown_end - seconds
+        if self.state == CAPTURE_DONE and self.resume_at is not None:
+            return self.resume_at
+        if self.capture_pending():
+            return self.capture_deadline
+        return None
+
+    def streak_progress(self, now=None):
+        """Gesture being confirmed and how far along it is (0..1 of the vote window), or None"""
+        if self.state in (DETECTING_FINGERS, AWAIT_THUMBS_UP) and self.vote.candidate is not None:
+            progress = self.vote.progress(self.clock() if now is None else now)
+            return {'gesture': self.vote.candidate, 'progress': round(progress, 3)}
+        return None
+
+    def status(self, now=None):
+        """State fields of a state_update payload"""
+        now = self.clock() if now is None else now
+        return {
+            'state': self.state,
+            'timer_value': self.timer_value,
+            'countdown': self.countdown(now),
+            'streak_progress': self.streak_progress(now),
+            'trigger_capture': self.capture_pending(),
+            'capture_count': self.capture_count,
+            'total_captures': self.photos_per_strip,
+            'strip_ready': self.capture_count >= self.photos_per_strip,
+            'strip_filename': self.strip_filename,
+        }
+
+    # --- frame sensors: (gesture, score, now) -> trigger or None ---
+
+    def _sense_fingers_seen(self, gesture, score, now):
+        return 'fingers_seen' if gesture in FINGER_COUNTS else None
+
+    def _sense_finger_vote(self, gesture, score, now):
+        confirmed = self.vote.update(gesture if gesture in FINGER_COUNTS else None, score, now)
+        if self.vote.candidate is None:
+            return 'fingers_lost'
+        return 'fingers_confirmed' if confirmed else None
+
+    def _sense_frame(self, gesture, score, now):
+        return 'frame'
+
+    def _sense_thumbs_vote(self, gesture, score, now):
+        if not self.vote.update(gesture if gesture in THUMBS_GESTURES else None, score, now):
+            return None
+        return 'thumbs_up_confirmed' if self.vote.candidate == "Thumbs Up" else 'fist_confirmed'
+
+    # --- transition actions: (data, now) ---
+
+    def _reset(self, data, now):
+        self.timer_value = None
+        self.countdown_end = None
+        self.resume_at = None
+        self.capture_deadline = None
+        self.capture_count = 0
+        self.photos = []
+        self.strip_filename = None
+        self.vote.clear()
+
+    def _start_vote(self, data, now):
+        gesture, score = data
+        self.vote.clear()
+        self.vote.update(gesture, score, now)
+
+    def _set_timer(self, data, now):
+        self.timer_value = FINGER_COUNTS[self.vote.candidate]
+        if self.verbose:
+            print(f"Timer set to: {self.timer_value}s")
+
+    def _clear_vote(self, data, now):
+        self.vote.clear()
+
+    def _start_countdown(self, data, now):
+        self.countdown_end = now + self.timer_value
+        self.resume_at = None
+        if self.verbose:
+            print(f"▶ Starting countdown: {self.timer_value}s")
+
+    def _trigger_capture(self, data, now):
+        self.countdown_end = None
+        self.capture_deadline = now + self.capture_timeout
+        if self.verbose:
+            print(f"Capture {self.capture_count + 1}/{self.photos_per_strip}")
+
+    def _store_photo(self, data, now):
+        self.capture_deadline = None
+        self.photos.append(data)
+        self.capture_count += 1
+        if self.state == CAPTURE_DONE:
+            self.resume_at = now + self.post_capture_pause
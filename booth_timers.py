@@ -0,0 +1,72 @@
+import time
+import heapq
+import itertools
+import threading
+
+
+class SessionTimers:
+    """At most one pending timer per key, fired in time order from a single thread.
+
+    Scheduling a key again replaces its pending timer, so each booth session
+    simply re-arms its timer for whatever is due next. run() sleeps on a
+    condition until the earliest deadline instead of polling, so callbacks
+    fire within a few ms of their time.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.closed = False
+        self._cond = threading.Condition()
+        self._heap = []
+        self._entries = {}
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def schedule(self, key, when, callback, *args):
+        with self._cond:
+            entry = [when, next(self._order), key, callback, args, True]
+            previous = self._entries.get(key)
+            if previous is not None:
+                previous[5] = False
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+
+    def cancel(self, key):
+        with self._cond:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                entry[5] = False
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def run(self):
+        """Fire timers until closed; meant to run as a background task"""
+        while True:
+            with self._cond:
+                while not self.closed:
+                    while self._heap and not self._heap[0][5]:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - self.clock()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if self.closed:
+                    return
+                entry = heapq.heappop(self._heap)
+                entry[5] = False
+                if self._entries.get(entry[2]) is entry:
+                    del self._entries[entry[2]]
+
+            try:
+                entry[3](*entry[4])
+            except Exception as e:
+                print(f"Timer error: {e}")
@@ -0,0 +1,96 @@
+import os
+import tempfile
+
+from PIL import Image
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_CAPTURE_BYTES = 20 * 1024 * 1024
+
+# Upload content type -> file extension for captures
+CAPTURE_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/webp': '.webp',
+    'image/png': '.png',
+}
+
+
+class CaptureTooLarge(ValueError):
+    pass
+
+
+def spool_upload(stream, directory, limit=MAX_CAPTURE_BYTES, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Copy an upload stream into a temporary file in directory, chunk by chunk.
+
+    Returns the temporary path; the caller renames it into place (or removes
+    it). Raises CaptureTooLarge once more than limit bytes arrive, so a
+    chunked upload with no Content-Length cannot fill the disk.
+    """
+    fd, path = tempfile.mkstemp(dir=directory, prefix='upload_', suffix='.part')
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise CaptureTooLarge(f"Capture is larger than {limit // (1024 * 1024)} MB")
+                out.write(chunk)
+        if size == 0:
+            raise ValueError("Empty capture upload")
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def fit_to_slot(photo, size):
+    """Centre-crop photo to the slot's aspect ratio and resize it to the slot"""
+    width, height = size
+    target_aspect = width / height
+    if photo.width / photo.height > target_aspect:
+        new_width = int(photo.height * target_aspect)
+        left = (photo.width - new_width) // 2
+        photo = photo.crop((left, 0, left + new_width, photo.height))
+    else:
+        new_height = int(photo.width / target_aspect)
+        top = (photo.height - new_height) // 2
+        photo = photo.crop((0, top, photo.width, top + new_height))
+    return photo.resize(size, Image.Resampling.LANCZOS)
+
+
+class Capture:
+    """One captured photo: the full-resolution file on disk plus a strip-slot-sized copy.
+
+    The capture is decoded once, when it arrives. What stays in memory is the
+    small RGB working copy (about 0.5 MB for a 482x378 slot), not the upload,
+    so a session's footprint doesn't grow with camera resolution. The file
+    stays the source of truth: slot_image() decodes it again when the copy
+    is missing or a different slot size is asked for.
+    """
+
+    __slots__ = ('path', 'slot', 'size')
+
+    def __init__(self, path, slot=None):
+        self.path = path
+        self.slot = slot
+        self.size = slot.size if slot is not None else None
+
+    @classmethod
+    def load(cls, path, size):
+        return cls(path, decode_for_slot(path, size))
+
+    def slot_image(self, size):
+        if self.slot is None or self.size != tuple(size):
+            self.slot = decode_for_slot(self.path, size)
+            self.size = self.slot.size
+        return self.slot
+
+
+def decode_for_slot(path, size):
+    """Decode an image file straight to a slot-sized RGB copy"""
+    with Image.open(path) as photo:
+        # JPEGs decode at a reduced DCT scale when the slot is much smaller
+        photo.draft('RGB', size)
+        return fit_to_slot(photo.convert('RGB'), tuple(size))
@@ -0,0 +1,81 @@
+"""Hand detector backends.
+
+Every backend is a HandDetector: detect(frame) takes a BGR frame and returns a
+gesture_rules.HandResult. The backend the booth uses comes from
+VISIONBOOTH_DETECTOR_BACKEND:
+
+    mediapipe   mp.solutions.hands (gesture_detector.GestureDetector, default)
+    tasks       MediaPipe Tasks GestureRecognizer in LIVE_STREAM mode
+    onnx        palm + landmark models on ONNX Runtime CPU
+    fixture     replays landmarks from a recording, no model at all
+
+Backends are imported only when selected, so e.g. onnxruntime is not needed
+to run the MediaPipe one.
+"""
+import os
+import time
+import importlib
+
+from hand_drawing import draw_result
+
+DEFAULT_BACKEND = 'mediapipe'
+
+# The web booth runs slightly looser than the detectors' own defaults;
+# options passed to create_detector() take precedence
+BOOTH_CONFIDENCE = {'min_detection_confidence': 0.6, 'min_tracking_confidence': 0.5}
+
+# name -> (module, factory, synchronous); see HandDetector.synchronous
+BACKENDS = {
+    'mediapipe': ('gesture_detector', 'create_booth_detector', True),
+    'tasks': ('tasks_detector', 'TasksGestureDetector', False),
+    'onnx': ('onnx_detector', 'OnnxHandDetector', True),
+    'fixture': ('fixture_detector', 'create_fixture_detector', True),
+}
+
+
+class HandDetector:
+    """Interface shared by the detector backends.
+
+    synchronous is False for backends whose detect() returns a result from an
+    earlier frame (LIVE_STREAM); such results must not be cached against the
+    frame they were returned for.
+    """
+
+    synchronous = True
+
+    def detect(self, frame, draw=False):
+        """Detect the hand in a BGR frame and return a HandResult, drawing it onto frame if draw"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def _draw(self, frame, result, timings):
+        started = time.perf_counter()
+        draw_result(frame, result)
+        timings['draw'] = time.perf_counter() - started
+
+
+def selected_backend():
+    return os.environ.get('VISIONBOOTH_DETECTOR_BACKEND', DEFAULT_BACKEND)
+
+
+def backend_synchronous(backend=None):
+    """Whether the backend's results belong to the frame passed to detect()"""
+    return BACKENDS.get(backend or selected_backend(), (None, None, True))[2]
+
+
+def create_detector(backend=None, **options):
+    """Detector for the given (or configured) backend with BOOTH_CONFIDENCE; options go to the backend's factory.
+
+    Module-level so it can be handed to DetectorPool workers, which read the
+    backend from their own environment.
+    """
+    backend = backend or selected_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend {backend!r} (choose from {', '.join(BACKENDS)})")
+    module_name, factory_name, _ = BACKENDS[backend]
+    factory = getattr(importlib.import_module(module_name), factory_name)
+    settings = dict(BOOTH_CONFIDENCE)
+    settings.update(options)
+    return factory(**settings)
@@ -0,0 +1,193 @@
+import os
+import time
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError
+
+from detector_backends import HandDetector
+
+DETECT_TIMEOUT = 2.0
+WATCH_INTERVAL = 1.0
+
+
+def _detector_worker(requests, results, factory):
+    """Worker process: one detector (and MediaPipe graph) per session routed here"""
+    os.environ['GLOG_minloglevel'] = '3'
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+    detectors = {}
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+
+        if message[0] == 'release':
+            detector = detectors.pop(message[1], None)
+            if detector is not None:
+                detector.close()
+            continue
+
+        _, key, request_id, frame = message
+        try:
+            detector = detectors.get(key)
+            if detector is None:
+                detector = detectors[key] = factory()
+            results.put((request_id, detector.detect(frame), None))
+        except Exception as e:
+            results.put((request_id, None, str(e)))
+
+    for detector in detectors.values():
+        detector.close()
+
+
+class PooledDetector(HandDetector):
+    """GestureDetector stand-in that runs detection on the pool worker its session is pinned to"""
+
+    def __init__(self, pool, key):
+        self.pool = pool
+        self.key = key
+        self.synchronous = pool.synchronous
+
+    def detect(self, frame, draw=False):
+        result = self.pool.detect(self.key, frame)
+        if draw:
+            # Only the landmarks travel back from the worker; draw here
+            self._draw(frame, result, result.timings)
+        return result
+
+    def close(self):
+        self.pool.release(self.key)
+
+
+class DetectorPool:
+    """Detector worker processes with sticky session routing.
+
+    Each session is pinned to one worker on first use, so its MediaPipe graph
+    and tracking state stay in a single process. Crashed workers are restarted
+    and requests that were in flight on them fail instead of hanging.
+    """
+
+    def __init__(self, num_workers, factory, timeout=DETECT_TIMEOUT, synchronous=True):
+        # spawn rather than fork: MediaPipe and the server threads don't survive a fork
+        self._ctx = multiprocessing.get_context('spawn')
+        self.factory = factory
+        self.timeout = timeout
+        self.synchronous = synchronous
+        self.restarts = 0
+        self.closed = False
+
+        self._results = self._ctx.Queue()
+        self._workers = [None] * num_workers
+        self._depths = [0] * num_workers
+        self._pending = {}
+        self._affinity = {}
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._keys = itertools.count()
+
+        for index in range(num_workers):
+            self._start_worker(index)
+
+        threading.Thread(target=self._collect_results, daemon=True).start()
+        threading.Thread(target=self._watch_workers, daemon=True).start()
+
+    def __len__(self):
+        return len(self._workers)
+
+    def handle(self):
+        """Create a detector handle for a new session"""
+        return PooledDetector(self, next(self._keys))
+
+    def detect(self, key, frame):
+        with self._lock:
+            index = self._affinity.get(key)
+            if index is None:
+                index = self._affinity[key] = self._least_loaded()
+            request_id = next(self._request_ids)
+            future = Future()
+            self._pending[request_id] = (future, index)
+            self._depths[index] += 1
+            requests = self._workers[index][1]
+
+        requests.put(('detect', key, request_id, frame))
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            with self._lock:
+                if self._pending.pop(request_id, None) is not None:
+                    self._depths[index] -= 1
+            raise
+
+    def release(self, key):
+        with self._lock:
+            index = self._affinity.pop(key, None)
+            if index is None or self.closed:
+                return
+            requests = self._workers[index][1]
+        requests.put(('release', key))
+
+    def queue_depths(self):
+        """Requests currently in flight on each worker"""
+        with self._lock:
+            return list(self._depths)
+
+    def session_counts(self):
+        """Sessions pinned to each worker"""
+        with self._lock:
+            return self._session_counts()
+
+    def close(self):
+        self.closed = True
+        for process, requests in self._workers:
+            requests.put(None)
+        for process, requests in self._workers:
+            process.join(timeout=2)
+
+    def _session_counts(self):
+        counts = [0] * len(self._workers)
+        for index in self._affinity.values():
+            counts[index] += 1
+        return counts
+
+    def _least_loaded(self):
+        counts = self._session_counts()
+        return counts.index(min(counts))
+
+    def _start_worker(self, index):
+        requests = self._ctx.Queue()
+        process = self._ctx.Process(target=_detector_worker,
+                                    args=(requests, self._results, self.factory), daemon=True)
+        process.start()
+        self._workers[index] = (process, requests)
+
+    def _collect_results(self):
+        while not self.closed:
+            request_id, result, error = self._results.get()
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+                if entry is not None:
+                    self._depths[entry[1]] -= 1
+            if entry is None:
+                continue
+            if error is not None:
+                entry[0].set_exception(RuntimeError(error))
+            else:
+                entry[0].set_result(result)
+
+    def _watch_workers(self):
+        while not self.closed:
+            time.sleep(WATCH_INTERVAL)
+            for index, (process, requests) in enumerate(self._workers):
+                if self.closed or process.is_alive():
+                    continue
+
+                print(f"Detector worker {index} exited ({process.exitcode}), restarting")
+                with self._lock:
+                    lost = [rid for rid, (_, w) in self._pending.items() if w == index]
+                    failed = [self._pending.pop(rid)[0] for rid in lost]
+                    self._depths[index] = 0
+                    self._start_worker(index)
+                    self.restarts += 1
+                for future in failed:
+                    future.set_exception(RuntimeError(f"Detector worker {index} crashed"))
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+
+from gesture_rules import HandResult, hand_result
+from detector_backends import HandDetector
+from landmark_log import load_recording, HANDEDNESS
+
+FIXTURE_PATH = os.environ.get('VISIONBOOTH_FIXTURE_LANDMARKS', 'fixtures/landmarks.npz')
+
+
+class FixtureDetector(HandDetector):
+    """Rules-only detector that ignores the frame and plays back recorded landmarks.
+
+    Each detect() call returns the next row of a landmark_log recording,
+    classified with the live gesture rules, looping at the end when loop is
+    set. Useful for exercising the booth without a model or camera.
+    """
+
+    def __init__(self, path=FIXTURE_PATH, loop=True):
+        recording = load_recording(path)
+        self.landmarks = recording['landmarks']
+        self.handedness = recording['handedness']
+        self.scores = recording['score']
+        self.loop = loop
+        self.position = 0
+
+    def detect(self, frame, draw=False):
+        timings = {}
+        if self.position >= len(self.landmarks):
+            if not self.loop or not len(self.landmarks):
+                return HandResult(timings=timings)
+            self.position = 0
+        index = self.position
+        self.position += 1
+
+        points = self.landmarks[index]
+        if np.isnan(points[0, 0]):
+            return HandResult(timings=timings)
+        handedness = HANDEDNESS[self.handedness[index]] if self.handedness[index] >= 0 else None
+        result = hand_result(points, handedness, float(self.scores[index]), timings)
+        if draw and frame is not None:
+            self._draw(frame, result, timings)
+        return result
+
+
+def create_fixture_detector(**options):
+    """FixtureDetector for VISIONBOOTH_FIXTURE_LANDMARKS; model options are ignored"""
+    return FixtureDetector(options.get('path', FIXTURE_PATH), options.get('loop', True))
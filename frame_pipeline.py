@@ -0,0 +1,165 @@
+import time
+import base64
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from adaptive import hand_fraction
+from gesture_rules import HandResult
+from hand_drawing import draw_result
+from metrics import INFERENCE_SKIPPED
+from booth_state import gesture_for_need, INFERENCE_NONE
+
+# Upload interval asked for while the state needs no detection. Countdown and
+# shutter run off the server's booth timers, so these frames only keep the
+# state_update stream alive.
+IDLE_STATE_INTERVAL_MS = 500
+
+
+@contextmanager
+def timed(timings, stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0) + time.perf_counter() - started
+
+
+def is_binary_frame(image):
+    return isinstance(image, (bytes, bytearray, memoryview))
+
+def decode_frame(image, flags=cv2.IMREAD_COLOR, timings=None):
+    """Decode a frame sent either as raw JPEG/WebP bytes or as a base64 data URL.
+
+    flags may be one of the IMREAD_REDUCED_COLOR_* modes to decode at 1/2, 1/4
+    or 1/8 scale.
+    """
+    timings = {} if timings is None else timings
+    if is_binary_frame(image):
+        img_data = image
+    else:
+        with timed(timings, 'base64_decode'):
+            img_data = base64.b64decode(image.split(',', 1)[1])
+    nparr = np.frombuffer(img_data, np.uint8)
+    with timed(timings, 'imdecode'):
+        return cv2.imdecode(nparr, flags)
+
+def encode_frame(frame, binary, quality=70, timings=None):
+    """JPEG-encode a frame, returning raw bytes for binary clients and a data URL otherwise"""
+    timings = {} if timings is None else timings
+    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+    with timed(timings, 'imencode'):
+        success, buffer = cv2.imencode('.jpg', frame, encode_param)
+    if not success:
+        return None
+    if binary:
+        return buffer.tobytes()
+    with timed(timings, 'base64_encode'):
+        return f"data:image/jpeg;base64,{base64.b64encode(buffer).decode('utf-8')}"
+
+
+def get_default_state(session, image):
+    with session.state_lock:
+        payload = session.machine.status()
+    payload.update({'frame': image, 'gesture': None, 'trigger_capture': False})
+    return payload
+
+
+def process_frame(session, image, landmarks_only=False, timings=None):
+    """Run one uploaded frame through decode, detection, the state machine and encode.
+
+    How much of that runs depends on what the session's current state needs
+    (see booth_state.STATE_INFERENCE). Returns the state_update payload for the session,
+    or None when the frame could not be encoded. Seconds spent per stage are
+    written to timings.
+    """
+    timings = {} if timings is None else timings
+    binary = is_binary_frame(image)
+
+    with session.state_lock:
+        need = session.machine.inference_need()
+    if need == INFERENCE_NONE:
+        # Countdown, capture and strip states ignore gestures: only advance the
+        # state machine and let the client show its own live video.
+        return state_payload(session, HandResult(), None, landmarks_only, timings, need, IDLE_STATE_INTERVAL_MS)
+
+    resolution = session.resolution
+    factor = resolution.factor
+    # An async backend's result belongs to an earlier frame, so it can't be
+    # cached against this one
+    gate = session.motion_gate if getattr(session.detector, 'synchronous', True) else None
+    started = time.perf_counter()
+
+    # Static scene: reuse the last detection. Byte-identical re-sends don't
+    # even need decoding unless the frame is going to be drawn and sent back.
+    result = None
+    if gate is not None:
+        with timed(timings, 'motion_gate'):
+            result = gate.reuse_for_bytes(image)
+
+    frame = None
+    if result is None or not landmarks_only:
+        frame = decode_frame(image, resolution.decode_flag(), timings)
+        if frame is None or frame.size == 0:
+            return get_default_state(session, None if landmarks_only else image)
+        if result is None and gate is not None:
+            with timed(timings, 'motion_gate'):
+                result = gate.reuse_for_frame(frame)
+
+    if result is None:
+        try:
+            with session.detector_lock:
+                result = session.detector.detect(frame)
+        except Exception as gesture_error:
+            print(f"Gesture detection error: {gesture_error}")
+            result = HandResult()
+        if gate is not None:
+            gate.remember(result)
+        timings.update(result.timings)
+
+        height, width = frame.shape[:2]
+        hand_size = hand_fraction(result.bbox, width, height) if result.found else None
+        resolution.update(height * factor, (time.perf_counter() - started) * 1000, hand_size)
+        inferred = True
+    else:
+        INFERENCE_SKIPPED.inc()
+        inferred = False
+
+    if landmarks_only:
+        encoded = None
+    else:
+        with timed(timings, 'draw'):
+            draw_result(frame, result)
+        encoded = encode_frame(frame, binary, timings=timings)
+        if encoded is None:
+            return None
+
+    # Pace on the cost of full frames only, or an idle booth would be told to send faster
+    if inferred:
+        session.pacing.update((time.perf_counter() - started) * 1000, session.frame_slot.dropped)
+
+    return state_payload(session, result, encoded, landmarks_only, timings, need)
+
+
+def state_payload(session, result, encoded, landmarks_only, timings, need, min_interval=None):
+    """Advance the session's state machine with a detection and build its state_update"""
+    machine = session.machine
+    # Only thumbs up / fist mean anything while awaiting the go; don't surface finger counts
+    gesture_name = gesture_for_need(need, result.gesture)
+    with session.state_lock:
+        now = machine.clock()
+        with timed(timings, 'state_machine'):
+            machine.step(gesture_name, result.score, now)
+        if session.recorder is not None:
+            session.recorder.record(now, result, machine.state)
+        payload = machine.status(now)
+
+    payload.update({
+        'frame': encoded,
+        'landmarks': result.landmarks.tolist() if landmarks_only and result.found else None,
+        'handedness': result.handedness if landmarks_only else None,
+        'gesture': gesture_name,
+        'pacing': session.pacing.hints(session.resolution.target_height, min_interval)
+    })
+    return payload
@@ -0,0 +1,56 @@
+import threading
+
+
+class LatestFrameSlot:
+    """Size-1 mailbox holding only the newest frame of a session.
+
+    Putting a frame while the previous one is still waiting replaces it, so the
+    worker always picks up the latest frame and stale ones are dropped instead
+    of queueing up behind a slow inference.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Store the newest frame; returns True when it replaced one that was never processed"""
+        with self._cond:
+            if self.closed:
+                return False
+            replaced = self._item is not None
+            if replaced:
+                self.dropped += 1
+            self._item = item
+            self.received += 1
+            self._cond.notify()
+            return replaced
+
+    def take(self, timeout=None):
+        """Wait for a frame and return it, or None on timeout / close"""
+        with self._cond:
+            if self._item is None and not self.closed:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._item = None
+            self._cond.notify_all()
+
+
+def frame_worker_loop(slot, handle_frame, poll_interval=1.0):
+    """Feed the newest frame of a slot to handle_frame until the slot is closed"""
+    while not slot.closed:
+        item = slot.take(timeout=poll_interval)
+        if item is None:
+            continue
+        try:
+            handle_frame(item)
+        except Exception as e:
+            print(f"Frame worker error: {e}")
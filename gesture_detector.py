@@ -1,189 +1,181 @@
+import os
 import cv2
 import mediapipe as mp
-import math
+import numpy as np
 import time
 
-class GestureDetector:
-    def __init__(self):
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=1,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.7
-        )
+from gesture_rules import HandResult, hand_result
+from detector_backends import HandDetector
+from adaptive import ModelComplexity
+
+ROI_EXPANSION = 2.0
+MIN_ROI_PX = 96
+MAX_ROI_AREA = 0.6
+FULL_SEARCH_INTERVAL = 30
 
-        self.last_timestamp = 0
-        self.frame_counter = 0
 
-    def distance(self, p1, p2):
-        """Calculate Euclidean distance between two points"""
-        return math.sqrt((p1.x - p2.x)**2 + (p1.y - p2.y)**2 + (p1.z - p2.z)**2)
+def landmark_array(landmarks):
+    """MediaPipe landmark list -> (21, 3) float32 array of normalized x, y, z"""
+    return np.array([(lm.x, lm.y, lm.z) for lm in landmarks], dtype=np.float32)
 
-    def detect_gesture(self, frame):
-        """Detect gesture with error handling for MediaPipe timestamp issues"""
 
+class GestureDetector(HandDetector):
+    """MediaPipe Hands wrapper returning HandResults.
+
+    complexity_controller, when given (see adaptive.ModelComplexity), is fed
+    the measured inference time of every frame and may switch the model
+    complexity at runtime.
+    """
+
+    def __init__(self, track_roi=True, model_complexity=1, min_detection_confidence=0.7,
+                 min_tracking_confidence=0.7, max_num_hands=1, complexity_controller=None):
+        self.mp_hands = mp.solutions.hands
+        self.model_complexity = model_complexity
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.max_num_hands = max_num_hands
+        self.complexity_controller = complexity_controller
+        self.hands = self._create_hands()
+
+        # Once a hand is found, following frames are run on a crop around it
+        self.track_roi = track_roi
+        self.roi = None
+        self.frames_since_search = 0
+        # Duration of the latest single hands.process() call
+        self.process_seconds = None
+
+    def _create_hands(self):
+        return self.mp_hands.Hands(
+            static_image_mode=False,
+            model_complexity=self.model_complexity,
+            max_num_hands=self.max_num_hands,
+            min_detection_confidence=self.min_detection_confidence,
+            min_tracking_confidence=self.min_tracking_confidence
+        )
+
+    def set_model_complexity(self, model_complexity):
+        """Rebuild the MediaPipe graph with another model (0 = lite, 1 = full)"""
+        if model_complexity == self.model_complexity:
+            return
+        print(f"Switching hand model complexity {self.model_complexity} -> {model_complexity}")
+        self.hands.close()
+        self.model_complexity = model_complexity
+        self.hands = self._create_hands()
+        self.roi = None
+
+    def close(self):
+        self.hands.close()
+
+    def detect(self, frame, draw=False):
+        """Detect the hand in a BGR frame and return a HandResult.
+
+        The frame is only drawn on when draw is True; callers that display the
+        frame later can call hand_drawing.draw_result themselves instead.
+        """
+        timings = {}
         if frame is None or frame.size == 0:
-            return frame, None
-        
+            return HandResult(timings=timings)
+
+        self.process_seconds = None
+        roi = self._tracking_roi(frame)
+        found = self._process(frame, roi, timings)
+        if found is None and roi is not None:
+            # Lost the hand inside the crop: search the whole frame straight away
+            found = self._process(frame, None, timings)
+        if self.complexity_controller is not None and self.process_seconds is not None:
+            # One model run, not the frame's total: a lost-track retry would double it
+            self.set_model_complexity(self.complexity_controller.update(self.process_seconds * 1000))
+        if found is None:
+            self.roi = None
+            return HandResult(timings=timings)
+
+        started = time.perf_counter()
+        points, classification = found
+        result = hand_result(points, classification.label, classification.score, timings)
+        self.roi = result.bbox if self.track_roi else None
+        timings['classify'] = time.perf_counter() - started
+
+        if draw:
+            self._draw(frame, result, timings)
+        return result
+
+    def _tracking_roi(self, frame):
+        """Pixel crop (left, top, right, bottom) around the last hand, or None for a full-frame search"""
+        if self.roi is None or self.frames_since_search >= FULL_SEARCH_INTERVAL:
+            self.frames_since_search = 0
+            return None
+
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = self.roi
+        center_x = (x0 + x1) / 2 * width
+        center_y = (y0 + y1) / 2 * height
+        half = max(MIN_ROI_PX, (x1 - x0) * width, (y1 - y0) * height) * ROI_EXPANSION / 2
+
+        left, right = int(max(0, center_x - half)), int(min(width, center_x + half))
+        top, bottom = int(max(0, center_y - half)), int(min(height, center_y + half))
+        if (right - left) * (bottom - top) > MAX_ROI_AREA * width * height:
+            # A crop this large saves little; keep MediaPipe on the full frame
+            self.frames_since_search = 0
+            return None
+
+        self.frames_since_search += 1
+        return left, top, right, bottom
+
+    def _process(self, frame, roi, timings):
+        """Run MediaPipe on the frame or a crop of it; returns (full-frame landmarks, handedness) or None"""
+        height, width = frame.shape[:2]
+        image = frame
+        if roi is not None:
+            left, top, right, bottom = roi
+            image = frame[top:bottom, left:right]
+
+        started = time.perf_counter()
         try:
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         except Exception as e:
             print(f"Frame conversion error: {e}")
-            return frame, None
+            return None
+        timings['cvtColor'] = timings.get('cvtColor', 0) + time.perf_counter() - started
 
-        gesture_name = None
+        started = time.perf_counter()
         try:
-            results = self.hands.process(frame_rgb)
+            results = self.hands.process(image_rgb)
         except Exception as e:
 
             if "timestamp" in str(e).lower():
                 print(f"MediaPipe timestamp error (ignoring): {e}")
             else:
                 print(f"MediaPipe error: {e}")
-            return frame, None
-
-        if results.multi_hand_landmarks:
-            hand_landmarks = results.multi_hand_landmarks[0]
-            landmarks = hand_landmarks.landmark
-            handedness = results.multi_handedness[0].classification[0].label
-            
-   
-            wrist = landmarks[0]
-            
-     
-            thumb_tip = landmarks[4]
-            thumb_ip = landmarks[3]
-            thumb_mcp = landmarks[2]
-            thumb_cmc = landmarks[1]
-            
-        
-            index_tip = landmarks[8]
-            index_pip = landmarks[6]
-            index_mcp = landmarks[5]
-            
-            middle_tip = landmarks[12]
-            middle_pip = landmarks[10]
-            middle_mcp = landmarks[9]
-            
-            ring_tip = landmarks[16]
-            ring_pip = landmarks[14]
-            ring_mcp = landmarks[13]
-            
-            pinky_tip = landmarks[20]
-            pinky_pip = landmarks[18]
-            pinky_mcp = landmarks[17]
-            
-            hand_size = self.distance(wrist, middle_mcp)
-
-            index_dist = self.distance(index_tip, index_mcp)
-            middle_dist = self.distance(middle_tip, middle_mcp)
-            ring_dist = self.distance(ring_tip, ring_mcp)
-            pinky_dist = self.distance(pinky_tip, pinky_mcp)
-            thumb_dist = self.distance(thumb_tip, thumb_cmc)
-            
-            index_ratio = index_dist / hand_size if hand_size > 0 else 0
-            middle_ratio = middle_dist / hand_size if hand_size > 0 else 0
-            ring_ratio = ring_dist / hand_size if hand_size > 0 else 0
-            pinky_ratio = pinky_dist / hand_size if hand_size > 0 else 0
-            thumb_ratio = thumb_dist / hand_size if hand_size > 0 else 0
-
-            FINGER_RATIO_THRESHOLD = 0.6
-            index_extended = (index_pip.y - index_tip.y) > 0.02 and index_ratio > FINGER_RATIO_THRESHOLD
-            middle_extended = (middle_pip.y - middle_tip.y) > 0.02 and middle_ratio > FINGER_RATIO_THRESHOLD
-            ring_extended = (ring_pip.y - ring_tip.y) > 0.02 and ring_ratio > FINGER_RATIO_THRESHOLD
-            pinky_extended = (pinky_pip.y - pinky_tip.y) > 0.02 and pinky_ratio > FINGER_RATIO_THRESHOLD
-
-            thumb_to_index_dist = self.distance(thumb_tip, index_mcp)
-            thumb_ratio_to_index = thumb_to_index_dist / hand_size if hand_size > 0 else 0
-            thumb_extended = thumb_ratio_to_index > 0.7 
-            
-
-            thumb_pointing_up = (thumb_mcp.y - thumb_tip.y) > 0.08
-            is_thumbs_up = (
-                thumb_extended and
-                thumb_pointing_up and
-                not index_extended and
-                not middle_extended and
-                not ring_extended and
-                not pinky_extended
-            )
-            
-
-            is_fist = (
-                not index_extended and
-                not middle_extended and
-                not ring_extended and
-                not pinky_extended and
-                thumb_ratio_to_index < 0.7  
-            )
-            
-            fingers_up = [index_extended, middle_extended, ring_extended, pinky_extended]
-            finger_count = sum(fingers_up)
-            
-            # === GESTURE PRIORITY ===
-            
-            # 1. FIST 
-            if is_fist:
-                gesture_name = "Fist"
-            
-            # 2. THUMBS UP 
-            elif is_thumbs_up:
-                gesture_name = "Thumbs Up"
-            
-            # 3. ONE FINGER - Only index extended
-            elif (index_extended and 
-                  not middle_extended and 
-                  not ring_extended and 
-                  not pinky_extended):
-                gesture_name = "One Finger"
-            
-            # 4. PEACE SIGN - Index and middle
-            elif (index_extended and 
-                  middle_extended and 
-                  not ring_extended and 
-                  not pinky_extended):
-                gesture_name = "Peace Sign"
-            
-            # 5. THREE FINGERS
-            elif (index_extended and 
-                  middle_extended and 
-                  ring_extended and 
-                  not pinky_extended):
-                gesture_name = "Three Fingers"
-            
-            # 6. FOUR FINGERS
-            elif finger_count == 4 and not thumb_extended:
-                gesture_name = "Four Fingers"
-            
-            # 7. OPEN PALM - All five 
-            elif finger_count == 4 and thumb_extended:
-                gesture_name = "Open Palm"
-            elif finger_count == 4 and thumb_ratio_to_index > 0.7:  
-                gesture_name = "Open Palm"
-
-            # Draw hand landmarks
-            mp.solutions.drawing_utils.draw_landmarks(
-                frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS
-            )
-            
-            if gesture_name:
-                cv2.putText(frame, f"Gesture: {gesture_name}", (10, 650), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-            else:
-                cv2.putText(frame, f"Gesture: None", (10, 650), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-
-            debug_text = f"Fingers: I:{int(index_extended)} M:{int(middle_extended)} R:{int(ring_extended)} P:{int(pinky_extended)} T:{int(thumb_extended)} = {finger_count+int(thumb_extended)}"
-            cv2.putText(frame, debug_text, (10, 680), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-
-            debug_dist = f"Ratios: I:{index_ratio:.2f} M:{middle_ratio:.2f} R:{ring_ratio:.2f} P:{pinky_ratio:.2f}"
-            cv2.putText(frame, debug_dist, (10, 710), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 150, 0), 1)
-
-            debug_thumb = f"Thumb: Ratio={thumb_ratio_to_index:.2f} Up={thumb_pointing_up} Ext={thumb_extended}"
-            cv2.putText(frame, debug_thumb, (10, 735), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 150, 0), 1)
-
-        return frame, gesture_name
+            return None
+        self.process_seconds = time.perf_counter() - started
+        timings['hands_process'] = timings.get('hands_process', 0) + self.process_seconds
+
+        if not results.multi_hand_landmarks:
+            return None
+
+        points = landmark_array(results.multi_hand_landmarks[0].landmark)
+        if roi is not None:
+            # Crop-normalized -> frame-normalized (z shares the x scale)
+            crop_width, crop_height = right - left, bottom - top
+            points[:, 0] = (points[:, 0] * crop_width + left) / width
+            points[:, 1] = (points[:, 1] * crop_height + top) / height
+            points[:, 2] *= crop_width / width
+        return points, results.multi_handedness[0].classification[0]
+
+
+def create_booth_detector(**options):
+    """GestureDetector configured from the environment.
+
+    VISIONBOOTH_MODEL_COMPLEXITY picks the hand model (0 = lite, 1 = full) and
+    VISIONBOOTH_INFERENCE_BUDGET_MS, when set, lets the detector drop to the
+    lite model while inference runs over that budget. options override any
+    of the GestureDetector arguments.
+    """
+    model_complexity = int(os.environ.get('VISIONBOOTH_MODEL_COMPLEXITY', '1'))
+    budget_ms = float(os.environ.get('VISIONBOOTH_INFERENCE_BUDGET_MS', '0'))
+    settings = {
+        'model_complexity': model_complexity,
+        'complexity_controller': ModelComplexity(budget_ms, model_complexity) if budget_ms > 0 else None,
+    }
+    settings.update(options)
+    return GestureDetector(**settings)
@@ -0,0 +1,131 @@
+import numpy as np
+
+FINGER_RATIO_THRESHOLD = 0.6
+EXTENSION_MARGIN = 0.02
+THUMB_EXTENSION_RATIO = 0.7
+THUMB_UP_MARGIN = 0.08
+
+FEATURE_NAMES = (
+    'index_ratio', 'middle_ratio', 'ring_ratio', 'pinky_ratio', 'thumb_ratio', 'thumb_index_ratio',
+    'index_extended', 'middle_extended', 'ring_extended', 'pinky_extended', 'thumb_extended', 'thumb_up',
+)
+
+# Checked in this order; the first matching rule names the gesture
+GESTURE_PRIORITY = ("Fist", "Thumbs Up", "One Finger", "Peace Sign", "Three Fingers", "Open Palm", "Four Fingers")
+_GESTURE_LABELS = np.array(GESTURE_PRIORITY + (None,), dtype=object)
+
+# Distances measured against the hand size (wrist -> middle MCP): index..pinky
+# tip -> MCP, thumb tip -> CMC and thumb tip -> index MCP
+_DIST_FROM = [8, 12, 16, 20, 4, 4]
+_DIST_TO = [5, 9, 13, 17, 1, 5]
+_FINGER_TIPS = [8, 12, 16, 20]
+_FINGER_PIPS = [6, 10, 14, 18]
+
+# Same skeleton as MediaPipe's HAND_CONNECTIONS (and the client overlay)
+HAND_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),
+)
+
+
+def hand_features_batch(points):
+    """(N, 12) feature matrix (see FEATURE_NAMES) for an (N, 21, 3) landmark array"""
+    points = np.asarray(points, dtype=np.float32)
+    hand_size = np.linalg.norm(points[:, 0] - points[:, 9], axis=1)
+    ratios = np.linalg.norm(points[:, _DIST_FROM] - points[:, _DIST_TO], axis=2)
+    ratios = np.divide(ratios, hand_size[:, None], out=np.zeros_like(ratios), where=hand_size[:, None] > 0)
+
+    extended = ((points[:, _FINGER_PIPS, 1] - points[:, _FINGER_TIPS, 1]) > EXTENSION_MARGIN) & \
+        (ratios[:, :4] > FINGER_RATIO_THRESHOLD)
+    thumb_extended = ratios[:, 5] > THUMB_EXTENSION_RATIO
+    thumb_up = (points[:, 2, 1] - points[:, 4, 1]) > THUMB_UP_MARGIN
+    return np.column_stack([ratios, extended, thumb_extended, thumb_up]).astype(np.float32)
+
+
+def classify_features_batch(features):
+    """Gesture names (object array, None where nothing matched) for an (N, 12) feature matrix"""
+    features = np.asarray(features)
+    index, middle, ring, pinky, thumb_extended, thumb_up = (features[:, 6:12] > 0.5).T
+    finger_count = index.astype(np.int8) + middle + ring + pinky
+    no_fingers = finger_count == 0
+
+    # === GESTURE PRIORITY === (same order as GESTURE_PRIORITY)
+    rules = np.stack([
+        no_fingers & (features[:, 5] < THUMB_EXTENSION_RATIO),
+        no_fingers & thumb_extended & thumb_up,
+        index & ~middle & ~ring & ~pinky,
+        index & middle & ~ring & ~pinky,
+        index & middle & ring & ~pinky,
+        (finger_count == 4) & thumb_extended,
+        finger_count == 4,
+    ])
+    first = np.where(rules.any(axis=0), rules.argmax(axis=0), len(GESTURE_PRIORITY))
+    return _GESTURE_LABELS[first]
+
+
+def classify_landmarks_batch(landmarks, handedness=None):
+    """Gesture names for an (N, 21, 3) array of normalized hand landmarks.
+
+    Applies the same rules as the live GestureDetector to N hands at once.
+    handedness (a label or one per hand) is accepted for symmetry with the
+    detector output; the current rules don't depend on it.
+    """
+    return classify_features_batch(hand_features_batch(landmarks))
+
+
+def hand_features(points):
+    """Feature vector (see FEATURE_NAMES) for a (21, 3) landmark array"""
+    return hand_features_batch(points[None])[0]
+
+
+def classify_features(features):
+    """Gesture name for a hand_features vector, or None"""
+    return classify_features_batch(features[None])[0]
+
+
+class HandResult:
+    """Outcome of one detection: the gesture plus what it was derived from.
+
+    landmarks is a (21, 3) float32 array of normalized coordinates, bbox the
+    normalized (x0, y0, x1, y1) around them, fingers the extended flags for
+    (thumb, index, middle, ring, pinky) and timings the seconds per stage.
+    All hand fields are None when no hand was found.
+    """
+
+    __slots__ = ('gesture', 'handedness', 'score', 'landmarks', 'bbox', 'fingers', 'features', 'timings')
+
+    def __init__(self, gesture=None, handedness=None, score=0.0, landmarks=None, bbox=None,
+                 fingers=None, features=None, timings=None):
+        self.gesture = gesture
+        self.handedness = handedness
+        self.score = score
+        self.landmarks = landmarks
+        self.bbox = bbox
+        self.fingers = fingers
+        self.features = features
+        self.timings = {} if timings is None else timings
+
+    @property
+    def found(self):
+        return self.landmarks is not None
+
+
+def hand_result(points, handedness, score, timings=None):
+    """Build a HandResult from a (21, 3) landmark array"""
+    features = hand_features(points)
+    flags = (features[6:12] > 0.5).tolist()
+    x0, y0 = points[:, :2].min(axis=0).tolist()
+    x1, y1 = points[:, :2].max(axis=0).tolist()
+    return HandResult(
+        gesture=classify_features(features),
+        handedness=handedness,
+        score=score,
+        landmarks=points,
+        bbox=(x0, y0, x1, y1),
+        fingers=(flags[4],) + tuple(flags[:4]),
+        features=features,
+        timings=timings,
+    )
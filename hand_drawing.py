@@ -0,0 +1,42 @@
+import cv2
+
+from gesture_rules import HAND_CONNECTIONS
+
+
+def draw_result(frame, result):
+    """Draw the hand skeleton and gesture debug text of a HandResult onto frame"""
+    if not result.found:
+        return frame
+
+    height, width = frame.shape[:2]
+    points = [(int(x * width), int(y * height)) for x, y, _ in result.landmarks.tolist()]
+    for start, end in HAND_CONNECTIONS:
+        cv2.line(frame, points[start], points[end], (224, 224, 224), 2)
+    for point in points:
+        cv2.circle(frame, point, 2, (0, 0, 255), 2)
+
+    if result.gesture:
+        cv2.putText(frame, f"Gesture: {result.gesture}", (10, 650), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    else:
+        cv2.putText(frame, f"Gesture: None", (10, 650), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+
+    features = result.features
+    index_ratio, middle_ratio, ring_ratio, pinky_ratio, _, thumb_ratio_to_index = features[:6].tolist()
+    thumb_extended, index_extended, middle_extended, ring_extended, pinky_extended = result.fingers
+    thumb_pointing_up = bool(features[11] > 0.5)
+    finger_count = index_extended + middle_extended + ring_extended + pinky_extended
+
+    debug_text = f"Fingers: I:{int(index_extended)} M:{int(middle_extended)} R:{int(ring_extended)} P:{int(pinky_extended)} T:{int(thumb_extended)} = {finger_count+int(thumb_extended)}"
+    cv2.putText(frame, debug_text, (10, 680), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+
+    debug_dist = f"Ratios: I:{index_ratio:.2f} M:{middle_ratio:.2f} R:{ring_ratio:.2f} P:{pinky_ratio:.2f}"
+    cv2.putText(frame, debug_dist, (10, 710), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 150, 0), 1)
+
+    debug_thumb = f"Thumb: Ratio={thumb_ratio_to_index:.2f} Up={thumb_pointing_up} Ext={thumb_extended}"
+    cv2.putText(frame, debug_thumb, (10, 735), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 150, 0), 1)
+    return frame
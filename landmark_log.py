@@ -0,0 +1,203 @@
+"""Record per-frame hand landmarks of a booth session and replay them offline.
+
+A recording is an .npz of equal-length columns, one row per frame the state
+machine saw:
+
+    t           float64 (N,)        time.time() the frame was processed at
+    landmarks   float32 (N, 21, 3)  normalized landmarks, NaN when no hand
+    handedness  int8 (N,)           index into HANDEDNESS, -1 when no hand
+    score       float32 (N,)        handedness confidence
+    gesture     int8 (N,)           index into GESTURE_PRIORITY, -1 for none
+    state       int8 (N,)           index into BOOTH_STATES after the frame
+
+A live session writes its recording in parts of CHUNK_ROWS rows
+(landmarks_00000.npz, landmarks_00001.npz, ... next to landmarks.npz), so
+memory stays bounded and a crash loses at most one part's worth of frames.
+load_recording() given the base name concatenates the parts.
+
+Replaying runs the landmarks through the classifier and a BoothStateMachine
+on the recorded clock, without MediaPipe or a camera:
+
+    python landmark_log.py sessions/20250101_120000_abcd1234/landmarks.npz
+    python landmark_log.py landmarks.npz --window-ms 800
+"""
+import os
+import glob
+import json
+import time
+import argparse
+import threading
+
+import numpy as np
+
+import gesture_rules
+import booth_state
+from booth_state import BoothStateMachine, ManualClock, gesture_for_need, CAPTURE_DONE, STRIP_GENERATING
+
+HANDEDNESS = ('Left', 'Right')
+CHUNK_ROWS = 1024
+BOOTH_STATES = booth_state.STATES
+
+# Column index -> name; the trailing None is what -1 (no gesture / state) maps to
+_GESTURE_LABELS = np.array(gesture_rules.GESTURE_PRIORITY + (None,), dtype=object)
+_STATE_LABELS = np.array(BOOTH_STATES + (None,), dtype=object)
+
+
+def _index(names, value):
+    return names.index(value) if value in names else -1
+
+
+def part_path(path, index):
+    """landmarks.npz -> landmarks_00003.npz"""
+    base, extension = os.path.splitext(path)
+    return f"{base}_{index:05d}{extension or '.npz'}"
+
+
+class LandmarkRecorder:
+    """Collects one row per processed frame and writes them out in compressed .npz parts.
+
+    Every chunk_rows rows are written to the next part_path(path, n), so a
+    session that stays connected all day holds at most one chunk in memory.
+    save() writes whatever is left as a final, shorter part.
+    """
+
+    def __init__(self, path, chunk_rows=CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.parts = 0
+        self.saved_rows = 0
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.saved_rows + len(self._rows)
+
+    def record(self, timestamp, result, state):
+        """Add a frame: its HandResult and the booth state name after the state machine ran"""
+        row = (timestamp, result.landmarks, _index(HANDEDNESS, result.handedness), result.score,
+               _index(gesture_rules.GESTURE_PRIORITY, result.gesture), _index(BOOTH_STATES, state))
+        with self._lock:
+            self._rows.append(row)
+            chunk = self._take_chunk() if len(self._rows) >= self.chunk_rows else None
+        if chunk is not None:
+            self._write(*chunk)
+
+    def save(self):
+        """Write the rows not yet in a part; returns that part's path or None"""
+        with self._lock:
+            chunk = self._take_chunk() if self._rows else None
+        if chunk is None:
+            return None
+        return self._write(*chunk)
+
+    def _take_chunk(self):
+        """Hand the buffered rows to a new part number; needs _lock"""
+        rows, self._rows = self._rows, []
+        index = self.parts
+        self.parts += 1
+        self.saved_rows += len(rows)
+        return part_path(self.path, index), rows
+
+    def _write(self, path, rows):
+        t, landmarks, handedness, score, gesture, state = zip(*rows)
+        empty = np.full((21, 3), np.nan, dtype=np.float32)
+        np.savez_compressed(
+            path,
+            t=np.array(t, dtype=np.float64),
+            landmarks=np.stack([empty if points is None else points for points in landmarks]).astype(np.float32),
+            handedness=np.array(handedness, dtype=np.int8),
+            score=np.array(score, dtype=np.float32),
+            gesture=np.array(gesture, dtype=np.int8),
+            state=np.array(state, dtype=np.int8),
+        )
+        print(f"Saved {len(rows)} landmark frames to {path}")
+        return path
+
+
+def load_recording(path):
+    """Load a recording: a single .npz, or the parts written for a recorder's base path"""
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    base, extension = os.path.splitext(path)
+    parts = sorted(glob.glob(f"{glob.escape(base)}_[0-9][0-9][0-9][0-9][0-9]{extension or '.npz'}"))
+    if not parts:
+        raise FileNotFoundError(path)
+    columns = {}
+    for part in parts:
+        with np.load(part) as data:
+            for name in data.files:
+                columns.setdefault(name, []).append(data[name])
+    return {name: np.concatenate(values) for name, values in columns.items()}
+
+
+def replay(recording, reclassify=True):
+    """Run a recording through the classifier and state machine on its own clock.
+
+    With reclassify the gestures are re-derived from the landmarks using the
+    current gesture_rules thresholds, otherwise the recorded ones are used.
+    Captures are acknowledged as soon as they trigger, and the strip is
+    treated as rendered straight away.
+    Returns the gesture and state names per frame plus capture timestamps.
+    """
+    timestamps = recording['t']
+    if reclassify:
+        has_hand = ~np.isnan(recording['landmarks'][:, 0, 0])
+        gestures = np.full(len(timestamps), None, dtype=object)
+        gestures[has_hand] = gesture_rules.classify_landmarks_batch(recording['landmarks'][has_hand])
+    else:
+        gestures = _GESTURE_LABELS[recording['gesture']]
+
+    clock = ManualClock()
+    machine = BoothStateMachine(clock=clock)
+    states = np.empty(len(timestamps), dtype=object)
+    captures = []
+    rows = zip(timestamps.tolist(), gestures.tolist(), recording['score'].tolist())
+    for i, (now, gesture_name, score) in enumerate(rows):
+        clock.set(now)
+        machine.step(gesture_for_need(machine.inference_need(), gesture_name), score)
+        if machine.state == CAPTURE_DONE and machine.photo_saved(None):
+            captures.append(now)
+        if machine.state == STRIP_GENERATING:
+            machine.strip_done()
+        states[i] = machine.state
+
+    return {'gestures': gestures, 'states': states, 'captures': captures}
+
+
+def summarize(recording, replayed, elapsed):
+    timestamps = recording['t']
+    names, counts = np.unique(replayed['states'].astype(str), return_counts=True)
+    return {
+        'frames': int(len(timestamps)),
+        'recorded_seconds': round(float(timestamps[-1] - timestamps[0]), 3) if len(timestamps) else 0.0,
+        'replay_fps': round(len(timestamps) / elapsed, 1) if elapsed else None,
+        'captures': len(replayed['captures']),
+        'states': dict(zip(names.tolist(), counts.tolist())),
+        'gesture_changes': int(np.count_nonzero(replayed['gestures'] != _GESTURE_LABELS[recording['gesture']])),
+        'state_mismatches': int(np.count_nonzero(replayed['states'] != _STATE_LABELS[recording['state']])),
+        'confirm_window_ms': booth_state.CONFIRM_WINDOW_MS,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded landmark stream through the booth state machine")
+    parser.add_argument('recording', help="landmarks.npz written by a booth session")
+    parser.add_argument('--window-ms', type=int, help="override CONFIRM_WINDOW_MS for this replay")
+    parser.add_argument('--recorded-gestures', action='store_true',
+                        help="use the gestures classified live instead of re-classifying the landmarks")
+    args = parser.parse_args(argv)
+
+    if args.window_ms:
+        booth_state.CONFIRM_WINDOW_MS = args.window_ms
+    recording = load_recording(args.recording)
+
+    started = time.perf_counter()
+    replayed = replay(recording, reclassify=not args.recorded_gestures)
+    elapsed = time.perf_counter() - started
+    print(json.dumps(summarize(recording, replayed, elapsed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+RENDER_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+
+
+def _labels(label, value, **extra):
+    pairs = ([(label, value)] if label else []) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    """Prometheus-style histogram with one series per value of an optional label"""
+
+    def __init__(self, name, help_text, label=None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value=None):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, label_value=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, label_value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda item: str(item[0]))
+            series = [(value, list(counts), total) for value, (counts, total) in series]
+        for value, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label, value, le=le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label, value)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label, value)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter",
+                f"{self.name} {self.value}"]
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time.
+
+    The callback returns a number, or a dict of label value -> number when the
+    gauge has a label.
+    """
+
+    def __init__(self, name, help_text, read, label=None):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.label = label
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        value = self.read()
+        if self.label:
+            for label_value, v in sorted(value.items()):
+                lines.append(f"{self.name}{_labels(self.label, label_value)} {v}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class RateMeter:
+    """Events per second over a sliding window"""
+
+    def __init__(self, window=10.0):
+        self.window = window
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def mark(self):
+        now = time.monotonic()
+        with self._lock:
+            self._times.append(now)
+            self._trim(now)
+
+    def rate(self):
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            return len(self._times) / self.window
+
+    def _trim(self, now):
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'visionbooth_stage_seconds', 'Time spent in each per-frame pipeline stage', label='stage'))
+STRIP_RENDER_SECONDS = REGISTRY.register(Histogram(
+    'visionbooth_strip_render_seconds', 'Time to render and save a photo strip', buckets=RENDER_BUCKETS))
+FRAMES_PROCESSED = REGISTRY.register(Counter(
+    'visionbooth_frames_processed_total', 'Video frames run through the pipeline'))
+FRAMES_DROPPED = REGISTRY.register(Counter(
+    'visionbooth_frames_dropped_total', 'Video frames replaced by a newer one before processing'))
+INFERENCE_SKIPPED = REGISTRY.register(Counter(
+    'visionbooth_inference_skipped_total', 'Frames that reused the previous detection because nothing changed'))
+TIMER_LATENESS = REGISTRY.register(Histogram(
+    'visionbooth_timer_lateness_seconds', 'How late booth timers (countdown ticks, shutter) fired'))
+FRAME_RATE = RateMeter()
+REGISTRY.register(Gauge(
+    'visionbooth_frames_per_second', 'Processed frames per second over the last 10s', FRAME_RATE.rate))
@@ -0,0 +1,204 @@
+import os
+import math
+import time
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+from gesture_rules import HandResult, hand_result
+from detector_backends import HandDetector
+
+PALM_MODEL_PATH = os.environ.get('VISIONBOOTH_PALM_MODEL', 'models/palm_detection_lite.onnx')
+LANDMARK_MODEL_PATH = os.environ.get('VISIONBOOTH_LANDMARK_MODEL', 'models/hand_landmark_lite.onnx')
+ONNX_THREADS = int(os.environ.get('VISIONBOOTH_ONNX_THREADS', '2'))
+
+PALM_INPUT = 192
+LANDMARK_INPUT = 224
+PALM_STRIDES = (8, 16, 16, 16)
+PALM_ANCHORS_PER_CELL = 2
+
+# Palm box -> hand crop, and landmarks -> next frame's crop, as in MediaPipe's graphs
+PALM_ROI_SCALE = 2.6
+PALM_ROI_SHIFT = -0.5
+TRACK_ROI_SCALE = 2.0
+TRACK_ROI_SHIFT = -0.1
+
+
+def palm_anchors(input_size=PALM_INPUT, strides=PALM_STRIDES):
+    """Normalized SSD anchor centres of the palm detector; (2016, 2) for a 192 px input"""
+    anchors = []
+    layer = 0
+    while layer < len(strides):
+        stride = strides[layer]
+        count = 0
+        # Consecutive layers with the same stride share one feature map
+        while layer < len(strides) and strides[layer] == stride:
+            count += PALM_ANCHORS_PER_CELL
+            layer += 1
+        size = int(math.ceil(input_size / stride))
+        ys, xs = np.meshgrid(np.arange(size), np.arange(size), indexing='ij')
+        centres = np.stack([(xs + 0.5) / size, (ys + 0.5) / size], axis=-1).reshape(-1, 1, 2)
+        anchors.append(np.repeat(centres, count, axis=1).reshape(-1, 2))
+    return np.concatenate(anchors).astype(np.float32)
+
+
+def hand_rotation(wrist, middle):
+    """Angle that turns the wrist -> middle finger direction upright, in [-pi, pi)"""
+    angle = math.pi / 2 - math.atan2(-(middle[1] - wrist[1]), middle[0] - wrist[0])
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+def rotated_roi(cx, cy, width, height, rotation, scale, shift):
+    """Square crop (cx, cy, side, rotation) around a box, shifted along the hand's own y axis"""
+    cx -= height * shift * math.sin(rotation)
+    cy += height * shift * math.cos(rotation)
+    return cx, cy, max(width, height) * scale, rotation
+
+
+def landmark_roi(points):
+    """Crop for the next frame from (21, 2) pixel landmarks"""
+    rotation = hand_rotation(points[0], points[9])
+    c, s = math.cos(rotation), math.sin(rotation)
+    local = points @ np.array([[c, -s], [s, c]])
+    low, high = local.min(axis=0), local.max(axis=0)
+    cx, cy = ((low + high) / 2) @ np.array([[c, s], [-s, c]])
+    width, height = high - low
+    return rotated_roi(cx, cy, width, height, rotation, TRACK_ROI_SCALE, TRACK_ROI_SHIFT)
+
+
+def roi_transform(roi, size):
+    """Affine matrix mapping the rotated crop onto a size x size image"""
+    cx, cy, side, rotation = roi
+    c, s = math.cos(rotation), math.sin(rotation)
+    corners = [(-0.5, -0.5), (0.5, -0.5), (-0.5, 0.5)]
+    source = np.float32([(cx + side * (u * c - v * s), cy + side * (u * s + v * c)) for u, v in corners])
+    target = np.float32([(0, 0), (size, 0), (0, size)])
+    return cv2.getAffineTransform(source, target)
+
+
+def _session(path, threads):
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+
+class OnnxHandDetector(HandDetector):
+    """Palm detection + hand landmark models (MediaPipe's, exported to ONNX) on ONNX Runtime CPU.
+
+    Like MediaPipe, the palm detector only runs until a hand is found; after
+    that each frame's crop comes from the previous frame's landmarks until the
+    landmark model's presence score drops under min_tracking_confidence.
+    intra_op_threads bounds the threads each model runs with, and quantized
+    exports of either model can be swapped in through the model paths.
+    """
+
+    def __init__(self, palm_model=PALM_MODEL_PATH, landmark_model=LANDMARK_MODEL_PATH,
+                 intra_op_threads=ONNX_THREADS, min_detection_confidence=0.7, min_tracking_confidence=0.7):
+        self.palm = _session(palm_model, intra_op_threads)
+        self.landmark = _session(landmark_model, intra_op_threads)
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.anchors = palm_anchors()
+        self.roi = None
+
+        # Models are exported either channels-first or channels-last
+        self._palm_nchw = self.palm.get_inputs()[0].shape[1] == 3
+        self._landmark_nchw = self.landmark.get_inputs()[0].shape[1] == 3
+        # Order outputs by last dimension: palm scores (1) before box regressors (18)
+        self._palm_outputs = sorted(self.palm.get_outputs(), key=lambda o: o.shape[-1])
+
+    def detect(self, frame, draw=False):
+        timings = {}
+        if frame is None or frame.size == 0:
+            return HandResult(timings=timings)
+
+        roi, tracked = self.roi, self.roi is not None
+        if roi is None:
+            roi = self._detect_palm(frame, timings)
+        found = self._landmarks(frame, roi, timings) if roi is not None else None
+        if found is None and tracked:
+            # Lost the hand from the tracked crop: search the whole frame straight away
+            roi = self._detect_palm(frame, timings)
+            found = self._landmarks(frame, roi, timings) if roi is not None else None
+        if found is None:
+            self.roi = None
+            return HandResult(timings=timings)
+
+        started = time.perf_counter()
+        points, handedness, score = found
+        self.roi = landmark_roi(points[:, :2])
+        height, width = frame.shape[:2]
+        points[:, 0] /= width
+        points[:, 1] /= height
+        points[:, 2] /= width
+        result = hand_result(points, handedness, score, timings)
+        timings['classify'] = time.perf_counter() - started
+
+        if draw:
+            self._draw(frame, result, timings)
+        return result
+
+    def _tensor(self, image, nchw):
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+        if nchw:
+            rgb = rgb.transpose(2, 0, 1)
+        return rgb[None]
+
+    def _detect_palm(self, frame, timings):
+        """Hand crop from the best palm detection, or None"""
+        started = time.perf_counter()
+        height, width = frame.shape[:2]
+        scale = PALM_INPUT / max(height, width)
+        resized = cv2.resize(frame, (int(round(width * scale)), int(round(height * scale))),
+                             interpolation=cv2.INTER_AREA)
+        pad_x, pad_y = (PALM_INPUT - resized.shape[1]) // 2, (PALM_INPUT - resized.shape[0]) // 2
+        canvas = np.zeros((PALM_INPUT, PALM_INPUT, 3), np.uint8)
+        canvas[pad_y:pad_y + resized.shape[0], pad_x:pad_x + resized.shape[1]] = resized
+
+        feed = {self.palm.get_inputs()[0].name: self._tensor(canvas, self._palm_nchw)}
+        raw_scores, raw_boxes = self.palm.run([o.name for o in self._palm_outputs], feed)
+        timings['palm_detect'] = timings.get('palm_detect', 0) + time.perf_counter() - started
+
+        scores = 1 / (1 + np.exp(-np.clip(raw_scores.reshape(-1), -100, 100)))
+        best = int(scores.argmax())
+        if scores[best] < self.min_detection_confidence:
+            return None
+
+        # Box and keypoints are offsets in input pixels from the anchor centre
+        box = raw_boxes.reshape(len(self.anchors), -1)[best] / PALM_INPUT
+        anchor = self.anchors[best]
+        keypoints = box[4:].reshape(-1, 2) + anchor
+        to_frame = lambda xy: (np.asarray(xy) * PALM_INPUT - (pad_x, pad_y)) / scale
+        cx, cy = to_frame(box[:2] + anchor)
+        wrist, middle = to_frame(keypoints[0]), to_frame(keypoints[2])
+        return rotated_roi(cx, cy, box[2] * PALM_INPUT / scale, box[3] * PALM_INPUT / scale,
+                           hand_rotation(wrist, middle), PALM_ROI_SCALE, PALM_ROI_SHIFT)
+
+    def _landmarks(self, frame, roi, timings):
+        """(21, 3) pixel landmarks, handedness and its score for a crop, or None if no hand in it"""
+        started = time.perf_counter()
+        matrix = roi_transform(roi, LANDMARK_INPUT)
+        crop = cv2.warpAffine(frame, matrix, (LANDMARK_INPUT, LANDMARK_INPUT), flags=cv2.INTER_LINEAR)
+        feed = {self.landmark.get_inputs()[0].name: self._tensor(crop, self._landmark_nchw)}
+        # Screen landmarks, hand presence, handedness (world landmarks are not used)
+        outputs = self.landmark.run(None, feed)
+        timings['hands_process'] = timings.get('hands_process', 0) + time.perf_counter() - started
+
+        presence = float(np.asarray(outputs[1]).reshape(-1)[0])
+        if presence < self.min_tracking_confidence:
+            return None
+        right = float(np.asarray(outputs[2]).reshape(-1)[0])
+
+        points = np.asarray(outputs[0], dtype=np.float32).reshape(21, 3)
+        inverse = cv2.invertAffineTransform(matrix)
+        xy = points[:, :2] @ inverse[:, :2].T + inverse[:, 2]
+        # z comes in crop pixels like x; bring it to frame pixels
+        z = points[:, 2] * roi[2] / LANDMARK_INPUT
+        points = np.column_stack([xy, z]).astype(np.float32)
+        if right > 0.5:
+            return points, 'Right', right
+        return points, 'Left', 1 - right
@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+
+import cv2
+import numpy as np
+import mediapipe as mp
+from mediapipe.tasks import python as mp_tasks
+from mediapipe.tasks.python import vision
+
+from gesture_rules import HandResult, hand_result
+from detector_backends import HandDetector
+
+GESTURE_MODEL_PATH = os.environ.get('VISIONBOOTH_GESTURE_MODEL', 'models/gesture_recognizer.task')
+# A frame whose result hasn't come back after this long (graph error,
+# dropped frame) is treated as lost, so the recognizer gets fed again.
+RESULT_DEADLINE = 0.5
+
+
+class TasksGestureDetector(HandDetector):
+    """GestureDetector backed by the MediaPipe Tasks GestureRecognizer in LIVE_STREAM mode.
+
+    detect() hands the frame to the recognizer with a monotonic timestamp and
+    returns without waiting for it: the result arrives on MediaPipe's own
+    thread, so inference on one frame overlaps with decoding the next. What
+    detect() returns is the newest result that has come back (normally the
+    previous frame's). While a frame is still in flight, new frames are not
+    submitted and detect() returns the last result straight away. Landmarks
+    go through the same rules as GestureDetector, so the gesture names match;
+    the recognizer's canned gesture labels are not used.
+    """
+
+    synchronous = False
+
+    def __init__(self, model_path=GESTURE_MODEL_PATH, min_detection_confidence=0.7,
+                 min_tracking_confidence=0.7, max_num_hands=1):
+        options = vision.GestureRecognizerOptions(
+            base_options=mp_tasks.BaseOptions(model_asset_path=model_path),
+            running_mode=vision.RunningMode.LIVE_STREAM,
+            num_hands=max_num_hands,
+            min_hand_detection_confidence=min_detection_confidence,
+            min_hand_presence_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            result_callback=self._on_result,
+        )
+        self.recognizer = vision.GestureRecognizer.create_from_options(options)
+
+        self._lock = threading.Lock()
+        self._result = HandResult()
+        # Set when a callback lands; its hands_process time is reported once
+        self._fresh = False
+        # In-flight timestamp -> perf_counter() at submission
+        self._submitted = {}
+        self._last_timestamp = 0
+
+    def close(self):
+        self.recognizer.close()
+
+    def detect(self, frame, draw=False):
+        """Submit a BGR frame and return the newest HandResult available"""
+        timings = {}
+        if frame is None or frame.size == 0:
+            return HandResult(timings=timings)
+
+        with self._lock:
+            self._expire(time.perf_counter())
+            busy = bool(self._submitted)
+            if busy:
+                # The recognizer would drop this frame anyway; don't wait for it
+                result = self._take_result(timings)
+
+        if not busy:
+            started = time.perf_counter()
+            image = mp.Image(image_format=mp.ImageFormat.SRGB, data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            timings['cvtColor'] = time.perf_counter() - started
+
+            # LIVE_STREAM rejects timestamps that don't strictly increase
+            timestamp = max(int(time.monotonic() * 1000), self._last_timestamp + 1)
+            self._last_timestamp = timestamp
+            with self._lock:
+                self._submitted[timestamp] = time.perf_counter()
+            try:
+                self.recognizer.recognize_async(image, timestamp)
+            except Exception as e:
+                print(f"MediaPipe Tasks error: {e}")
+                with self._lock:
+                    self._submitted.pop(timestamp, None)
+                return HandResult(timings=timings)
+
+            with self._lock:
+                result = self._take_result(timings)
+        if draw:
+            self._draw(frame, result, timings)
+        return result
+
+    def _expire(self, now):
+        """Forget in-flight frames whose result is overdue; needs _lock"""
+        for timestamp, submitted in list(self._submitted.items()):
+            if now - submitted > RESULT_DEADLINE:
+                del self._submitted[timestamp]
+
+    def _on_result(self, recognition, output_image, timestamp_ms):
+        """Result callback, called on MediaPipe's thread"""
+        with self._lock:
+            submitted = self._submitted.pop(timestamp_ms, None)
+        timings = {}
+        if submitted is not None:
+            timings['hands_process'] = time.perf_counter() - submitted
+
+        if recognition.hand_landmarks:
+            points = np.array([(lm.x, lm.y, lm.z) for lm in recognition.hand_landmarks[0]], dtype=np.float32)
+            category = recognition.handedness[0][0]
+            result = hand_result(points, category.category_name, category.score, timings)
+        else:
+            result = HandResult(timings=timings)
+
+        with self._lock:
+            self._result = result
+            self._fresh = True
+
+    def _take_result(self, timings):
+        """Copy of the latest result with this call's timings; needs _lock.
+
+        The callback's own timings (hands_process, classify) are only
+        reported by the first call after it lands, so inference isn't
+        counted again for every frame that reuses the result.
+        """
+        result = self._result
+        merged = dict(result.timings) if self._fresh else {}
+        merged.update(timings)
+        self._fresh = False
+        return HandResult(result.gesture, result.handedness, result.score, result.landmarks, result.bbox,
+                          result.fingers, result.features, merged)